@@ -0,0 +1,106 @@
+"""
+Author: Shawny
+Benchmark Excel write/read times for a large synthetic `cases` sheet.
+
+    python benchmarks/bench_excel.py --rows 200000
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ms_test_stats.excel import SHEETS, _has_module, read_excel_sheets, write_excel  # noqa: E402
+from ms_test_stats.stats import build_summaries  # noqa: E402
+
+
+def synthetic_cases(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    tops = np.array(["ut", "st", "perf_test"])
+    subs = np.array(["python", "ops", "networks", "parallel", "graph_kernel"])
+    levels = np.array(["level0", "level1", "level2", "level3", "unmarked"])
+    devices = np.array(["cpu", "gpu", "npu", "cpu,npu", "gpu,npu", "cpu,gpu,npu", "unknown"])
+    top = tops[rng.integers(0, len(tops), n)]
+    sub = subs[rng.integers(0, len(subs), n)]
+    owner_subdir = np.char.add(np.char.add(top, "/"), sub)
+    file_ids = rng.integers(0, max(1, n // 8), n)
+    files = np.char.add(np.char.add(np.char.add("/repo/tests/", owner_subdir), "/test_"), file_ids.astype(str))
+    level = levels[rng.integers(0, len(levels), n)]
+    asserts = rng.integers(0, 6, n)
+    has_doc = rng.random(n) < 0.3
+    has_param = rng.random(n) < 0.3
+    is_skip = rng.random(n) < 0.05
+    score = (asserts >= 1) * 2 + (asserts >= 3) + has_param + has_doc - is_skip
+    grade = np.where(score >= 4, "A", np.where(score >= 2, "B", "C"))
+    return pd.DataFrame({
+        "file": np.char.add(files, ".py"),
+        "dir_group": owner_subdir,
+        "owner_top": top,
+        "owner_subdir": owner_subdir,
+        "test": np.char.add("test_case_", np.arange(n).astype(str)),
+        "level": level,
+        "devices": devices[rng.integers(0, len(devices), n)],
+        "markers": np.char.add(level, ",platform_arm_ascend_training"),
+        "pytest_decorators": np.char.add("pytest.mark.", level),
+        "is_skip": is_skip,
+        "assert_count": asserts,
+        "has_docstring": has_doc,
+        "has_parametrize": has_param,
+        "quality_score": score,
+        "quality_grade": grade,
+    })
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def _legacy_write(path: Path, dfs) -> None:
+    with pd.ExcelWriter(path, engine="openpyxl") as w:
+        for key, sheet in SHEETS:
+            dfs[key].to_excel(w, sheet_name=sheet, index=False)
+
+
+def _legacy_read(path: Path) -> None:
+    for _, name in SHEETS:
+        pd.read_excel(path, sheet_name=name)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--skip-legacy", action="store_true", help="skip the old per-sheet / normal-mode baseline")
+    args = ap.parse_args()
+
+    dfs = build_summaries(synthetic_cases(args.rows))
+    write_engines = ["openpyxl"] + (["xlsxwriter"] if _has_module("xlsxwriter") else [])
+    read_engines = ["openpyxl"] + (["calamine"] if _has_module("python_calamine") else [])
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        if not args.skip_legacy:
+            legacy = tmp / "legacy.xlsx"
+            results.append(("write", "legacy pandas/openpyxl", _timed(lambda: _legacy_write(legacy, dfs))))
+            results.append(("read", "legacy per-sheet openpyxl", _timed(lambda: _legacy_read(legacy))))
+        for we in write_engines:
+            path = tmp / f"{we}.xlsx"
+            results.append(("write", f"streaming {we}", _timed(lambda: write_excel(str(path), engine=we, **dfs))))
+        path = tmp / f"{write_engines[0]}.xlsx"
+        for re_ in read_engines:
+            results.append(("read", f"single-pass {re_}", _timed(lambda: read_excel_sheets(str(path), engine=re_))))
+
+    print(f"cases sheet: {args.rows} rows")
+    for op, name, secs in results:
+        print(f"  {op:<6} {name:<28} {secs:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Author: Shawny
+End-to-end benchmark on a generated test tree: times every stage and writes JSON for cross-commit comparison.
+
+    python benchmarks/bench_pipeline.py --files 20000 --repeat 3
+    python benchmarks/bench_pipeline.py --files 20000 --compare benchmarks/results/pipeline-<commit>.json
+
+Stages: walk, read, parse (in-process), parse_parallel (engine), build_dataframes, write_store,
+write_excel, load_store / load_excel (cold data_service load) and every API endpoint (cold and warm).
+No MindSpore clone is needed; tree shape options come from synthetic_tree.py.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from ms_test_stats import data_service  # noqa: E402
+from ms_test_stats.engine import iter_parse, rows_to_cases  # noqa: E402
+from ms_test_stats.excel import write_excel  # noqa: E402
+from ms_test_stats.parser import extract_testcases_from_file  # noqa: E402
+from ms_test_stats.scanner import collect_sources, walk_py_files  # noqa: E402
+from ms_test_stats.stats import build_dataframes  # noqa: E402
+from ms_test_stats.store import write_store  # noqa: E402
+from ms_test_stats.webapp import create_app  # noqa: E402
+from synthetic_tree import add_spec_args, generate_tree, spec_from_args  # noqa: E402
+
+RESULT_FORMAT = 1
+# a stage counts as a regression in --compare when its median grows by more than this
+REGRESSION_THRESHOLD = 0.10
+
+
+def _git_commit() -> str:
+    res = subprocess.run(["git", "-C", str(ROOT), "rev-parse", "--short", "HEAD"],
+                         capture_output=True, text=True, check=False)
+    return res.stdout.strip() or "unknown"
+
+
+def _timed(fn: Callable):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def _endpoints(store: str) -> List[str]:
+    # drill-down parameters come from the data service, not a request, so no app cache is warmed here
+    ld = data_service.fetch_level_device(store)
+    level = ld["levels"][0] if ld["levels"] else "level0"
+    device = ld["devices"][0] if ld["devices"] else "cpu"
+    return ["/api/level_device", "/api/dir_top", "/api/quality", "/api/quality_owner_table",
+            "/api/pytest_decorators_table",
+            f"/api/cases?level={level}&device={device}&limit=200",
+            f"/api/cases_quality?level={level}&grade=B&limit=200"]
+
+
+def run_once(tests_root: Path, work: Path, cfg: dict, api_repeat: int) -> Dict[str, dict]:
+    """One pass over every stage; returns {stage: {"seconds": s, ...extra}}."""
+    level_pattern = cfg.get("level_regex", r"^level\d+$")
+    level_re = re.compile(level_pattern)
+    res: Dict[str, dict] = {}
+
+    secs, entries = _timed(lambda: sorted(walk_py_files(tests_root)))
+    res["walk"] = {"seconds": secs, "files": len(entries)}
+
+    secs, sources = _timed(lambda: collect_sources(tests_root, [Path(p) for p, _, _ in entries]))
+    res["read"] = {"seconds": secs, "bytes": sum(size for _, _, size in entries)}
+
+    def parse_serial():
+        n = 0
+        for path, src in sources:
+            try:
+                n += len(extract_testcases_from_file(path, src, level_re))
+            except SyntaxError:
+                pass
+        return n
+    secs, n_cases = _timed(parse_serial)
+    res["parse"] = {"seconds": secs, "cases": n_cases}
+    del sources
+
+    def parse_parallel():
+        cases = []
+        for path, _, _, rows in iter_parse([(p, size, None) for p, _, size in entries], level_pattern):
+            cases.extend(rows_to_cases(path, rows))
+        return cases
+    secs, cases = _timed(parse_parallel)
+    res["parse_parallel"] = {"seconds": secs, "cases": len(cases), "workers": os.cpu_count()}
+
+    secs, dfs = _timed(lambda: build_dataframes(cases, cfg["device_keywords"], str(tests_root),
+                                                cfg.get("dir_group_depth", 2)))
+    res["build_dataframes"] = {"seconds": secs, "rows": len(dfs["df_cases_all"])}
+
+    store, excel = str(work / "stats_store"), str(work / "stats.xlsx")
+    res["write_store"] = {"seconds": _timed(lambda: write_store(store, **dfs))[0]}
+    res["write_excel"] = {"seconds": _timed(lambda: write_excel(excel, engine=cfg.get("excel_engine", "auto"),
+                                                                **dfs))[0]}
+
+    for name, path in (("load_store", store), ("load_excel", excel)):
+        data_service.clear_cache()
+        res[name] = {"seconds": _timed(lambda: data_service.load_case_table(path))[0]}
+
+    for url in _endpoints(store):
+        data_service.clear_cache()
+        data_service.load_case_table(store)     # cold = data loaded, nothing derived from it yet
+        client = create_app(store).test_client()  # fresh app: its payload cache is empty too
+        cold, resp = _timed(lambda: client.get(url))
+        if resp.status_code != 200:
+            raise RuntimeError(f"{url} -> {resp.status_code}")
+        warm = [_timed(lambda: client.get(url))[0] for _ in range(api_repeat)]
+        res[f"api {url.split('?')[0]}"] = {"seconds": cold, "warm_median": statistics.median(warm)}
+    return res
+
+
+def _merge(runs: List[Dict[str, dict]]) -> Dict[str, dict]:
+    out = {}
+    for stage in runs[0]:
+        times = [r[stage]["seconds"] for r in runs]
+        extra = {k: v for k, v in runs[-1][stage].items() if k != "seconds"}
+        out[stage] = {"median": statistics.median(times), "min": min(times), "runs": times, **extra}
+    return out
+
+
+def _compare(result: dict, baseline_path: str) -> int:
+    base = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    print(f"\nvs {base['meta']['commit']} ({baseline_path}):")
+    slower = 0
+    for stage, cur in result["stages"].items():
+        old = base["stages"].get(stage)
+        if not old:
+            continue
+        ratio = cur["median"] / old["median"] if old["median"] else float("inf")
+        flag = ""
+        if ratio > 1 + REGRESSION_THRESHOLD:
+            flag, slower = "  <-- slower", slower + 1
+        print(f"  {stage:<36} {old['median']:9.4f} -> {cur['median']:9.4f} s  x{ratio:5.2f}{flag}")
+    return slower
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    add_spec_args(ap)
+    ap.add_argument("--tree", metavar="DIR", help="use an existing tests root instead of generating one")
+    ap.add_argument("--repeat", type=int, default=1, help="full pipeline passes; medians are reported")
+    ap.add_argument("--api-repeat", type=int, default=20, help="warm requests per endpoint")
+    ap.add_argument("--output", metavar="FILE",
+                    help="result JSON (default benchmarks/results/pipeline-<commit>.json)")
+    ap.add_argument("--compare", metavar="FILE", help="print per-stage ratios against an earlier result")
+    args = ap.parse_args()
+
+    cfg = yaml.safe_load((ROOT / "config.yaml").read_text(encoding="utf-8"))
+    commit = _git_commit()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        if args.tree:
+            tests_root, tree = Path(args.tree), {"tests_root": args.tree}
+        else:
+            secs, tree = _timed(lambda: generate_tree(tmp / "repo", spec_from_args(args)))
+            tests_root = Path(tree["tests_root"])
+            print(f"[OK] Generated {tree['files']} files ({tree['bytes'] / 1e6:.1f} MB) in {secs:.1f}s")
+        runs = []
+        for i in range(args.repeat):
+            work = tmp / f"out{i}"
+            work.mkdir()
+            runs.append(run_once(tests_root, work, cfg, args.api_repeat))
+
+    result = {
+        "format": RESULT_FORMAT,
+        "meta": {"commit": commit, "time": int(time.time()), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpu_count": os.cpu_count(), "repeat": args.repeat},
+        "tree": {k: v for k, v in tree.items() if k != "tests_root"},
+        "stages": _merge(runs),
+    }
+
+    print(f"{'stage':<38} {'median s':>10} {'min s':>10}")
+    for stage, r in result["stages"].items():
+        warm = f"  (warm {r['warm_median'] * 1000:.2f} ms)" if "warm_median" in r else ""
+        print(f"  {stage:<36} {r['median']:10.4f} {r['min']:10.4f}{warm}")
+
+    out = Path(args.output or ROOT / "benchmarks" / "results" / f"pipeline-{commit}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=1), encoding="utf-8")
+    print(f"[OK] Results written to: {out}")
+
+    if args.compare and _compare(result, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Author: Shawny
+Scan the same tree in two processes with different hash seeds and require an empty run diff.
+
+    python benchmarks/check_determinism.py --files 2000
+    python benchmarks/check_determinism.py --tree /path/to/mindspore/tests
+
+Anything that depends on set / dict iteration order of strings (e.g. which level marker wins) shows
+up as spurious level / device / grade changes in diff_runs.py and the history trends; this exits 1 then.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from ms_test_stats.diff import diff_case_tables  # noqa: E402
+from ms_test_stats.engine import iter_parse, rows_to_cases  # noqa: E402
+from ms_test_stats.scanner import walk_py_files  # noqa: E402
+from ms_test_stats.stats import build_case_table  # noqa: E402
+from synthetic_tree import add_spec_args, generate_tree, spec_from_args  # noqa: E402
+
+HASH_SEEDS = ("1", "2")
+
+
+def _dump(tests_root: str, out: str) -> None:
+    """Scan tests_root (parallel engine, no cache) and pickle the case table."""
+    cfg = yaml.safe_load((ROOT / "config.yaml").read_text(encoding="utf-8"))
+    entries = sorted(walk_py_files(Path(tests_root), cfg.get("scan_exclude") or []))
+    cases = []
+    for path, _, _, rows in iter_parse([(p, size, None) for p, _, size in entries],
+                                       cfg.get("level_regex", r"^level\d+$")):
+        cases.extend(rows_to_cases(path, rows))
+    df = build_case_table(cases, cfg["device_keywords"], tests_root, cfg.get("dir_group_depth", 2))
+    df.to_pickle(out)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    add_spec_args(ap)
+    ap.add_argument("--tree", metavar="DIR", help="use an existing tests root instead of generating one")
+    ap.add_argument("--dump", nargs=2, metavar=("TESTS_ROOT", "OUT"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.dump:
+        _dump(*args.dump)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        tests_root = args.tree or generate_tree(tmp / "repo", spec_from_args(args))["tests_root"]
+        tables = []
+        for seed in HASH_SEEDS:
+            out = tmp / f"cases-{seed}.pkl"
+            subprocess.run([sys.executable, __file__, "--dump", str(tests_root), str(out)], check=True,
+                           env={**os.environ, "PYTHONHASHSEED": seed})
+            tables.append(pd.read_pickle(out))
+
+    summary = diff_case_tables(tables[0], tables[1], str(tests_root), str(tests_root)).summary()
+    detail = ", ".join(f"{k}: {v}" for k, v in summary.items())
+    if any(v for k, v in summary.items() if k != "unchanged"):
+        print(f"[ERROR] Two scans of the same tree differ (PYTHONHASHSEED {' vs '.join(HASH_SEEDS)}): {detail}")
+        sys.exit(1)
+    print(f"[OK] {len(tables[0])} cases identical across PYTHONHASHSEED {' vs '.join(HASH_SEEDS)}")
+
+
+if __name__ == "__main__":
+    main()
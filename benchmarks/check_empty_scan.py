@@ -0,0 +1,44 @@
+"""
+Author: Shawny
+Build the summaries of a scan that found no test cases and require empty sheets with the usual dtypes.
+
+    python benchmarks/check_empty_scan.py
+
+A tests root without test functions (or a fully excluded one) must give empty sheets, not a KeyError in
+build_summaries; this exits 1 otherwise.
+"""
+import sys
+from pathlib import Path
+
+import pandas as pd
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from ms_test_stats.stats import CATEGORY_COLUMNS, NUMERIC_DTYPES, build_case_table, build_dataframes  # noqa: E402
+
+
+def main():
+    cfg = yaml.safe_load((ROOT / "config.yaml").read_text(encoding="utf-8"))
+    errors = []
+    try:
+        dfs = build_dataframes([], cfg["device_keywords"], "tests", cfg.get("dir_group_depth", 2))
+    except Exception as e:  # noqa: BLE001 - report any failure as a check result
+        print(f"[ERROR] build_dataframes([]) failed: {type(e).__name__}: {e}")
+        sys.exit(1)
+    errors += [f"{name} has {len(df)} rows" for name, df in dfs.items() if len(df)]
+
+    df = build_case_table([], cfg["device_keywords"], "tests")
+    errors += [f"{c} is {df[c].dtype}, not categorical" for c in CATEGORY_COLUMNS
+               if not isinstance(df[c].dtype, pd.CategoricalDtype)]
+    errors += [f"{c} is {df[c].dtype}, not {pd.api.types.pandas_dtype(t)}" for c, t in NUMERIC_DTYPES.items()
+               if df[c].dtype != t]
+    if errors:
+        print(f"[ERROR] Empty scan: {'; '.join(errors)}")
+        sys.exit(1)
+    print(f"[OK] Empty scan gives {len(dfs)} empty sheets")
+
+
+if __name__ == "__main__":
+    main()
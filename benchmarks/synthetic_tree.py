@@ -0,0 +1,130 @@
+"""
+Author: Shawny
+Generate a synthetic MindSpore-like `tests/` tree for offline benchmarks.
+
+    python benchmarks/synthetic_tree.py /tmp/ms_bench --files 20000 --tests-per-file 8
+"""
+import argparse
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List
+
+TOPS = {
+    "ut": ["python/ops", "python/nn", "python/dataset", "python/parallel", "cpp/runtime"],
+    "st": ["ops/ascend", "ops/gpu", "ops/cpu", "networks", "auto_parallel", "dynamic_shape"],
+    "perf_test": ["models", "kernels"],
+}
+LEVELS = ["level0", "level1", "level2", "level3"]
+DEVICE_MARKS = ["platform_x86_cpu", "platform_arm_cpu", "platform_x86_gpu_training",
+                "platform_arm_ascend_training", "platform_ascend910b", "env_onecard", "env_single"]
+
+
+@dataclass
+class TreeSpec:
+    files: int = 2000
+    tests_per_file: int = 6           # mean; each file gets 1..2*mean-1
+    subdirs_per_area: int = 8         # leaf directories under each tests/<top>/<area>/
+    class_ratio: float = 0.3          # files that put their tests in a Test* class
+    pytestmark_ratio: float = 0.2     # files with a module-level pytestmark
+    alias_ratio: float = 0.3          # files that alias marks (level0 = pytest.mark.level0)
+    parametrize_ratio: float = 0.25   # tests with @pytest.mark.parametrize
+    skip_ratio: float = 0.05
+    helper_ratio: float = 0.15        # files without any test function (utils, data generators)
+    syntax_error_ratio: float = 0.002
+    body_lines: int = 12              # mean statements per test body
+    seed: int = 0
+
+
+def _test_source(rng: random.Random, name: str, decorators: List[str], indent: str, spec: TreeSpec) -> str:
+    lines = [f"{indent}{d}" for d in decorators]
+    args = "self, " if indent else ""
+    param = rng.random() < spec.parametrize_ratio
+    if param:
+        lines.append(f"{indent}@pytest.mark.parametrize('shape', [(2, 3), (4, 5, 6)])")
+    lines.append(f"{indent}def {name}({args}{'shape' if param else 'mode'}):")
+    body = indent + "    "
+    if rng.random() < 0.3:
+        lines.append(f'{body}"""Feature: {name}. Expectation: success."""')
+    for i in range(rng.randint(1, 2 * spec.body_lines)):
+        r = rng.random()
+        if r < 0.15:
+            lines.append(f"{body}assert out{i % 3}.shape == expect.shape")
+        elif r < 0.22:
+            lines.append(f"{body}np.testing.assert_allclose(out, expect, rtol=1e-4)")
+        elif r < 0.5:
+            lines.append(f"{body}x{i} = ms.Tensor(np.random.randn(2, 3).astype(np.float32))")
+        else:
+            lines.append(f"{body}out{i % 3} = net(x{i - 1 if i else 0}, {i})")
+    return "\n".join(lines) + "\n"
+
+
+def _file_source(rng: random.Random, spec: TreeSpec) -> str:
+    if rng.random() < spec.helper_ratio:
+        return ("import numpy as np\n\n\ndef gen_data(shape):\n    return np.random.randn(*shape)\n\n\n"
+                "def helper_net(x):\n    return x * 2\n")
+    out = ["import numpy as np", "import pytest", "import mindspore as ms", ""]
+    aliased = rng.random() < spec.alias_ratio
+    if aliased:
+        out += [f"{lv} = pytest.mark.{lv}" for lv in LEVELS[:2]] + [""]
+    if rng.random() < spec.pytestmark_ratio:
+        out += [f"pytestmark = [pytest.mark.{rng.choice(LEVELS)}, pytest.mark.{rng.choice(DEVICE_MARKS)}]", ""]
+
+    def decorators() -> List[str]:
+        level = rng.choice(LEVELS)
+        decs = [f"@{level}" if aliased and level in LEVELS[:2] else f"@pytest.mark.{level}"]
+        decs += [f"@pytest.mark.{m}" for m in rng.sample(DEVICE_MARKS, rng.randint(0, 3))]
+        if rng.random() < spec.skip_ratio:
+            decs.append("@pytest.mark.skip(reason='flaky')")
+        return decs
+
+    n_tests = rng.randint(1, max(1, 2 * spec.tests_per_file - 1))
+    if rng.random() < spec.class_ratio:
+        out.append(f"@pytest.mark.{rng.choice(DEVICE_MARKS)}")
+        out.append("class TestOps:")
+        out.append("    def setup_method(self):\n        self.net = None\n")
+        out += [_test_source(rng, f"test_case_{t}", decorators(), "    ", spec) for t in range(n_tests)]
+    else:
+        out += [_test_source(rng, f"test_case_{t}", decorators(), "", spec) for t in range(n_tests)]
+    if rng.random() < spec.syntax_error_ratio:
+        out.append("def test_broken(:\n    pass\n")
+    return "\n".join(out) + "\n"
+
+
+def generate_tree(root: Path, spec: TreeSpec) -> Dict[str, object]:
+    """Write spec.files test modules under root/tests; returns the spec plus the tests root."""
+    rng = random.Random(spec.seed)
+    leaves = [f"{top}/{area}/sub{i}" for top, areas in TOPS.items() for area in areas
+              for i in range(spec.subdirs_per_area)]
+    tests_root = Path(root) / "tests"
+    total_bytes = 0
+    for n in range(spec.files):
+        d = tests_root / leaves[n % len(leaves)]
+        d.mkdir(parents=True, exist_ok=True)
+        src = _file_source(rng, spec)
+        total_bytes += len(src)
+        (d / f"test_{n}.py").write_text(src, encoding="utf-8")
+    return {**asdict(spec), "tests_root": str(tests_root), "bytes": total_bytes}
+
+
+def add_spec_args(ap: argparse.ArgumentParser) -> None:
+    defaults = TreeSpec()
+    for name, value in asdict(defaults).items():
+        ap.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+
+
+def spec_from_args(args: argparse.Namespace) -> TreeSpec:
+    return TreeSpec(**{name: getattr(args, name) for name in asdict(TreeSpec())})
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    ap.add_argument("root", help="directory to create (tests/ goes inside)")
+    add_spec_args(ap)
+    args = ap.parse_args()
+    info = generate_tree(Path(args.root), spec_from_args(args))
+    print(f"[OK] {info['files']} files, {info['bytes'] / 1e6:.1f} MB under {info['tests_root']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Author: Shawny
+Compare the case tables of two runs: added / removed tests and level, device or grade changes.
+
+    python diff_runs.py output/batch/master/stats_store output/batch/r2.3/stats_store
+    python diff_runs.py old_stats.xlsx output/stats_store --only downgraded --output downgraded.csv
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from ms_test_stats.data_service import load_case_table, run_tests_root
+from ms_test_stats.diff import CHANGE_KINDS, diff_case_tables
+
+
+def _write(changes: pd.DataFrame, path: Path) -> None:
+    suffix = path.suffix.lower()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if suffix == ".csv":
+        changes.to_csv(path, index=False)
+    elif suffix == ".json":
+        path.write_text(json.dumps(changes.to_dict(orient="records"), ensure_ascii=False, indent=1),
+                        encoding="utf-8")
+    elif suffix == ".xlsx":
+        changes.to_excel(path, sheet_name="diff", index=False)
+    else:
+        raise SystemExit(f"[ERROR] Unsupported output format: {path.suffix} (use .csv, .json or .xlsx)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Diff the test cases of two runs (store dirs or Excel files).")
+    ap.add_argument("before", help="baseline run: columnar store directory or stats.xlsx")
+    ap.add_argument("after", help="run to compare: columnar store directory or stats.xlsx")
+    ap.add_argument("--root-before", metavar="DIR",
+                    help="tests root of the baseline run (default: the one recorded in its store, else the "
+                         "deepest directory shared by its files)")
+    ap.add_argument("--root-after", metavar="DIR", help="tests root of the compared run (same default)")
+    ap.add_argument("--only", metavar="KINDS", default="",
+                    help=f"comma-separated change kinds to report: {','.join(CHANGE_KINDS)}")
+    ap.add_argument("--output", metavar="FILE", help="write the changes to FILE (.csv, .json or .xlsx)")
+    ap.add_argument("--limit", type=int, default=50, help="rows to print (default 50, 0 for none)")
+    ap.add_argument("--fail-on-downgrade", action="store_true",
+                    help="exit with status 1 when any test was downgraded (for MR checks)")
+    args = ap.parse_args()
+
+    diff = diff_case_tables(load_case_table(args.before), load_case_table(args.after),
+                            args.root_before or run_tests_root(args.before),
+                            args.root_after or run_tests_root(args.after))
+    summary = diff.summary()
+    print("[OK] " + ", ".join(f"{k}: {v}" for k, v in summary.items()))
+
+    kinds = [k for k in args.only.split(",") if k]
+    try:
+        changes = diff.changes[diff.mask(kinds)]
+    except ValueError as e:
+        ap.error(str(e))
+
+    if args.limit and len(changes):
+        with pd.option_context("display.width", 200, "display.max_columns", None, "display.max_colwidth", 60):
+            print(changes.head(args.limit).to_string(index=False))
+        if len(changes) > args.limit:
+            print(f"... {len(changes) - args.limit} more")
+    if args.output:
+        _write(changes, Path(args.output))
+        print(f"[OK] {len(changes)} changes written to: {args.output}")
+
+    if args.fail_on_downgrade and summary["downgraded"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
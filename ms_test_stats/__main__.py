@@ -0,0 +1,6 @@
+"""
+Author: Shawny
+"""
+from ms_test_stats.cli import main
+
+main()
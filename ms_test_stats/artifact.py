@@ -0,0 +1,59 @@
+"""
+Author: Shawny
+Parsed-case artifact: the output of the scan stage, read back by the stats stage.
+
+Keeping it on disk lets `stats`, `export` and `serve` (python -m ms_test_stats) run without
+walking and parsing the tests tree again. Rows are stored per file in the compact
+TestCaseMeta.to_row() form, like the parse cache.
+"""
+import os
+import pickle
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import config_fingerprint
+from .engine import rows_to_cases
+from .parser import TestCaseMeta
+
+CASES_FORMAT = 1
+
+
+def save_cases(path: str, by_file: Dict[str, List[TestCaseMeta]], tests_root: str, level_pattern: str,
+               commit: Optional[str] = None) -> None:
+    """Write {file: cases} plus the scan's metadata; replaces the previous artifact atomically."""
+    out = Path(path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "format": CASES_FORMAT,
+        "fingerprint": config_fingerprint(level_pattern),
+        "tests_root": str(tests_root),
+        "commit": commit,
+        "created": time.time(),
+        "files": {p: [c.to_row() for c in cases] for p, cases in by_file.items()},
+    }
+    tmp = out.with_name(out.name + ".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, out)
+
+
+def _read(path: str, level_pattern: Optional[str]) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    if not isinstance(data, dict) or data.get("format") != CASES_FORMAT:
+        raise ValueError(f"{path} is not a cases artifact of format {CASES_FORMAT}; re-run the scan")
+    if level_pattern is not None and data["fingerprint"] != config_fingerprint(level_pattern):
+        raise ValueError(f"{path} was scanned with a different level_regex or parser version; re-run the scan")
+    return data
+
+
+def load_cases(path: str, level_pattern: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, List[TestCaseMeta]]]:
+    """Return (metadata, {file: cases}).
+
+    Raises FileNotFoundError when there is no artifact, and ValueError when it was written by another
+    format or, if `level_pattern` is given, with a different level regex (the scan has to be redone).
+    """
+    data = _read(path, level_pattern)
+    files = data.pop("files")
+    return data, {p: rows_to_cases(p, rows) for p, rows in files.items()}
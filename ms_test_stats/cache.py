@@ -0,0 +1,106 @@
+"""
+Author: Shawny
+On-disk per-file parse cache — lets a re-run skip files that did not change.
+"""
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .parser import PARSER_VERSION, TestCaseMeta
+
+CACHE_FORMAT = 2
+
+# file_path -> (mtime_ns, size, digest, rows)
+_Entry = Tuple[int, int, str, List[tuple]]
+
+
+def config_fingerprint(level_pattern: str) -> str:
+    """Everything besides file content that influences parse results."""
+    raw = f"{CACHE_FORMAT}|{PARSER_VERSION}|{level_pattern}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ContentIndex:
+    """Parse results by content digest, shared by the trees of one batch run.
+
+    `at` maps a path relative to its tree to the digest last seen there: the same file in the next tree
+    is handed to the workers with that digest, so they hash it while reading and skip parsing on a match.
+    """
+
+    def __init__(self, rows: Optional[Dict[str, List[tuple]]] = None):
+        self.rows: Dict[str, List[tuple]] = rows if rows is not None else {}
+        self.at: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+class ParseCache:
+    def __init__(self, path: str, fingerprint: str):
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.entries: Dict[str, _Entry] = {}
+
+    @classmethod
+    def load(cls, path: str, fingerprint: str) -> "ParseCache":
+        """Load the cache; a missing, corrupt or foreign-config file yields an empty cache."""
+        cache = cls(path, fingerprint)
+        try:
+            with open(cache.path, "rb") as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            return cache
+        if isinstance(data, dict) and data.get("fingerprint") == fingerprint:
+            cache.entries = data.get("entries", {})
+        return cache
+
+    def lookup(self, file_path: str, mtime_ns: int, size: int) -> Optional[List[TestCaseMeta]]:
+        """Cheap hit: file stat unchanged since it was cached."""
+        entry = self.entries.get(file_path)
+        if entry is None or entry[0] != mtime_ns or entry[1] != size:
+            return None
+        return [TestCaseMeta.from_row(file_path, r) for r in entry[3]]
+
+    def expected_digest(self, file_path: str) -> Optional[str]:
+        """Digest of the cached content, so a worker can skip parsing identical bytes."""
+        entry = self.entries.get(file_path)
+        return entry[2] if entry is not None else None
+
+    def rows(self, file_path: str) -> List[tuple]:
+        return self.entries[file_path][3]
+
+    def store_rows(self, file_path: str, mtime_ns: int, size: int, digest: str, rows: List[tuple]) -> None:
+        self.entries[file_path] = (mtime_ns, size, digest, rows)
+
+    def content_index(self) -> Dict[str, List[tuple]]:
+        """digest -> rows for every cached file, to reuse results for identical content at other paths."""
+        return {digest: rows for _, _, digest, rows in self.entries.values()}
+
+    def prune(self, keep, roots: Optional[Iterable] = None) -> int:
+        """Drop entries for files no longer present; returns how many were removed.
+
+        With `roots`, only entries under those directories are candidates, so a scan of one tree
+        (run.py, a `batch` branch) leaves the entries of the other trees sharing this cache alone.
+        """
+        if roots is not None:
+            prefixes = tuple(os.path.join(str(r), "") for r in roots)
+            stale = [p for p in self.entries if p.startswith(prefixes) and p not in keep]
+        else:
+            stale = [p for p in self.entries if p not in keep]
+        for p in stale:
+            del self.entries[p]
+        return len(stale)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump({"fingerprint": self.fingerprint, "entries": self.entries}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
@@ -0,0 +1,204 @@
+"""
+Author: Shawny
+Staged command line: python -m ms_test_stats <command>
+
+    scan                      walk + parse tests_dir           -> output/cases.pkl (cases_artifact)
+    stats                     cases artifact                   -> output/stats_store (+ history)
+    export excel|html|pdf     stats                            -> stats.xlsx / report.html / dashboard.pdf
+    serve                     dashboard over the current stats
+
+Every stage reads the previous stage's output and only runs that stage first when the output is
+missing (or older than its own input); --rescan forces a fresh scan.
+"""
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+from .artifact import load_cases
+from .data_service import data_last_modified, run_meta
+from .excel import SHEETS
+from .pipeline import (
+    build_stats,
+    data_path_of,
+    level_pattern_of,
+    open_parse_cache,
+    ordered_cases,
+    record_history,
+    scan,
+    scanned_commit,
+    tests_root_of,
+    write_data,
+    write_run_report,
+)
+from .pdf import export_pdfs
+from .profiling import RunProfile, capture
+from .report import write_report
+from .store import is_store, read_store
+from .webapp import create_app
+
+EXPORT_FORMATS = ("excel", "html", "pdf")
+REPORT_HTML = "output/report.html"
+
+
+def _paths(cfg) -> Dict[str, object]:
+    return {
+        "repo_root": Path(cfg["repo_root"]).resolve(),
+        "tests_root": tests_root_of(cfg),
+        "level_pattern": level_pattern_of(cfg),
+        "cases": cfg.get("cases_artifact", "output/cases.pkl"),
+        "excel": cfg.get("output_excel", "output/stats.xlsx"),
+        "store": cfg.get("output_store", "output/stats_store"),
+    }
+
+
+def cmd_scan(cfg, profile: RunProfile, commit: Optional[str] = None) -> Dict[str, list]:
+    if not _paths(cfg)["cases"]:
+        raise SystemExit("[ERROR] `cases_artifact` is disabled in config.yaml; the staged CLI needs it")
+    return scan(cfg, profile, open_parse_cache(cfg), commit=commit)
+
+
+def _cases(cfg, profile: RunProfile, rescan: bool) -> Tuple[List, Optional[str]]:
+    """(cases, commit they were scanned at), from the cases artifact or a fresh scan."""
+    p = _paths(cfg)
+    if not rescan and p["cases"]:
+        try:
+            with profile.stage("load_cases") as st:
+                meta, by_file = load_cases(p["cases"], p["level_pattern"])
+                st["files"] = len(by_file)
+            if meta["tests_root"] == str(p["tests_root"]):
+                print(f"[OK] Reusing {len(by_file)} parsed files from: {p['cases']}")
+                return ordered_cases(by_file), meta.get("commit")
+            print(f"[WARN] {p['cases']} was scanned from {meta['tests_root']}; scanning again")
+        except FileNotFoundError:
+            print(f"[INFO] No parsed cases at {p['cases']}; scanning first")
+        except ValueError as e:
+            print(f"[WARN] {e}")
+    commit = scanned_commit(cfg)
+    return ordered_cases(cmd_scan(cfg, profile, commit)), commit
+
+
+def cmd_stats(cfg, profile: RunProfile, rescan: bool = False) -> str:
+    """Build the stats tables from the cases artifact; returns the path the dashboard reads."""
+    p = _paths(cfg)
+    cases, commit = _cases(cfg, profile, rescan)
+    dfs = build_stats(cases, cfg, p["tests_root"], profile)
+    data_path = write_data(cfg, dfs, p["excel"], p["store"], profile, excel=False, commit=commit)
+    # stats is rebuilt from the same cases artifact many times (export, serve); one snapshot per scan result
+    record_history(cfg, dfs, p["repo_root"], profile, skip_unchanged=True)
+    return data_path
+
+
+def ensure_stats(cfg, profile: RunProfile, rescan: bool = False) -> str:
+    """Current stats, rebuilt when missing or older than the cases artifact."""
+    data_path = data_path_of(cfg)
+    if rescan or not Path(data_path).exists():
+        return cmd_stats(cfg, profile, rescan)
+    cases = Path(_paths(cfg)["cases"] or "")
+    if cases.is_file() and cases.stat().st_mtime > data_last_modified(data_path):
+        print(f"[INFO] {cases} is newer than {data_path}; rebuilding stats")
+        return cmd_stats(cfg, profile)
+    print(f"[OK] Reusing stats from: {data_path}")
+    return data_path
+
+
+def cmd_export(cfg, profile: RunProfile, fmt: str, output: Optional[str] = None, rescan: bool = False) -> str:
+    data_path = ensure_stats(cfg, profile, rescan)
+    if fmt == "excel":
+        out = output or _paths(cfg)["excel"]
+        if not is_store(data_path):
+            if Path(out).resolve() != Path(data_path).resolve():
+                raise SystemExit(f"[ERROR] No columnar store to export from (stats are in {data_path})")
+            print(f"[OK] Excel is up to date: {out}")
+            return out
+        with profile.stage("read_store"):
+            _, tables = read_store(data_path)
+        dfs = {key: tables[table] for key, table in SHEETS}
+        meta = run_meta(data_path)
+        write_data(cfg, dfs, out, None, profile, tests_root=meta.get("tests_root"), commit=meta.get("commit"))
+    elif fmt == "html":
+        out = output or REPORT_HTML
+        with profile.stage("write_report"):
+            write_report(data_path, out)
+        print(f"[OK] Static report written to: {out}")
+    else:
+        out = output or cfg.get("output_pdf", "output/dashboard.pdf")
+        with profile.stage("write_report"):
+            write_report(data_path, REPORT_HTML)
+        with profile.stage("render_pdf", pages=1):
+            export_pdfs([(REPORT_HTML, out)])
+    return out
+
+
+def cmd_export_batch_pdf(cfg, profile: RunProfile) -> int:
+    """One PDF per `batch` branch (<batch_output_dir>/<name>/dashboard.pdf), all through one browser."""
+    out_root = Path(cfg.get("batch_output_dir", "output/batch"))
+    jobs = []
+    with profile.stage("write_report") as st:
+        for branch in cfg.get("batch") or []:
+            out_dir = out_root / branch["name"]
+            store, excel = out_dir / "stats_store", out_dir / "stats.xlsx"
+            data_path = str(store) if is_store(str(store)) else str(excel)
+            if not Path(data_path).exists():
+                print(f"[WARN] No stats for batch {branch['name']} in {out_dir} (run.py --batch first); skipped")
+                continue
+            write_report(data_path, str(out_dir / "report.html"))
+            jobs.append((str(out_dir / "report.html"), str(out_dir / "dashboard.pdf")))
+        st["reports"] = len(jobs)
+    if not jobs:
+        raise SystemExit("[ERROR] Nothing to export: no batch outputs found")
+    with profile.stage("render_pdf", pages=len(jobs)):
+        return export_pdfs(jobs)
+
+
+def serve(cfg, data_path: str, host: str, port: int) -> None:
+    print(f"[OK] Start web on http://{host}:{port}")
+    app = create_app(data_path, history_db=cfg.get("history_db", "output/history.sqlite"),
+                     diff_baseline=cfg.get("diff_baseline"))
+    app.run(host=host, port=port, debug=False)
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--config", default="config.yaml", help="config file (default config.yaml)")
+    common.add_argument("--profile", nargs="?", const="cprofile", choices=["cprofile", "pyinstrument"],
+                        help="also profile this command in-process (default cprofile)")
+    reuse = argparse.ArgumentParser(add_help=False)
+    reuse.add_argument("--rescan", action="store_true",
+                       help="scan and rebuild the stats even if earlier outputs exist")
+
+    ap = argparse.ArgumentParser(prog="python -m ms_test_stats",
+                                 description="MindSpore test statistics, one pipeline stage at a time.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    sub.add_parser("scan", parents=[common], help="walk and parse tests_dir into the cases artifact")
+    sub.add_parser("stats", parents=[common, reuse], help="build the stats store from the cases artifact")
+    export_ap = sub.add_parser("export", parents=[common, reuse], help="write Excel, the static report or a PDF")
+    export_ap.add_argument("format", choices=EXPORT_FORMATS)
+    export_ap.add_argument("--output", metavar="FILE", help="output file (default from config.yaml)")
+    export_ap.add_argument("--batch", action="store_true",
+                           help="pdf only: one PDF per `batch` branch from the run.py --batch outputs")
+    serve_ap = sub.add_parser("serve", parents=[common, reuse], help="serve the dashboard over the current stats")
+    serve_ap.add_argument("--host", default="127.0.0.1")
+    serve_ap.add_argument("--port", type=int, default=5000)
+    args = ap.parse_args(argv)
+
+    cfg = yaml.safe_load(Path(args.config).read_text(encoding="utf-8"))
+    profile = RunProfile(args.command if args.command != "export" else f"export {args.format}")
+    profile_dir = str(Path(cfg.get("run_report") or "output/run_report.json").parent)
+    with capture(args.profile, profile_dir):
+        if args.command == "scan":
+            cmd_scan(cfg, profile)
+        elif args.command == "stats":
+            cmd_stats(cfg, profile, args.rescan)
+        elif args.command == "export" and args.batch:
+            if args.format != "pdf":
+                ap.error("--batch is only supported for `export pdf`")
+            cmd_export_batch_pdf(cfg, profile)
+        elif args.command == "export":
+            cmd_export(cfg, profile, args.format, args.output, args.rescan)
+        else:
+            data_path = ensure_stats(cfg, profile, args.rescan)
+    write_run_report(cfg, profile)
+    if args.command == "serve":
+        serve(cfg, data_path, args.host, args.port)
@@ -1,45 +1,122 @@
 """
 Author: Shawny
-Shared data layer for webapp and report — reads Excel once and caches.
+Shared data layer for webapp and report — reads the data once and caches.
+
+`data_path` is either a columnar store directory (preferred, see store.py) or an
+Excel workbook written by excel.write_excel.
 """
 import os
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
+from .device_map import csv_masks
+from .diff import CaseDiff, diff_case_tables
+from .excel import read_excel_meta, read_excel_sheets
+from .store import CURRENT_FILE, current_version, is_store, read_store, read_store_meta
+
 UNMARKED_LEVEL = "unmarked"
 
 # ---------------------------------------------------------------------------
-# Module-level cache: keyed by (excel_path, mtime)
+# Module-level cache: keyed by (data_path, version) — store version or Excel mtime
 # ---------------------------------------------------------------------------
-_cache: Dict[str, Tuple[float, Dict[str, pd.DataFrame]]] = {}
+_cache: Dict[str, Tuple[Any, Dict[str, pd.DataFrame]]] = {}
+
+# Pinned data paths (live server mode) -> time their current version was installed by refresh().
+# Requests on a pinned path never touch the disk; they only see versions swapped in whole.
+_pinned: Dict[str, float] = {}
+
+
+def data_version(data_path: str) -> Any:
+    """Cheap identifier that changes whenever the underlying data changes."""
+    if data_path in _pinned:
+        return _cache[data_path][0]
+    if is_store(data_path):
+        return current_version(data_path)
+    return os.path.getmtime(data_path)
+
+
+def data_last_modified(data_path: str) -> float:
+    """Timestamp of the current data version (for HTTP Last-Modified)."""
+    if data_path in _pinned:
+        return _pinned[data_path]
+    if is_store(data_path):
+        return os.path.getmtime(os.path.join(data_path, CURRENT_FILE))
+    return os.path.getmtime(data_path)
+
+
+def _read_sheets(data_path: str) -> Tuple[Any, Dict[str, pd.DataFrame]]:
+    if is_store(data_path):
+        return read_store(data_path)
+    version = os.path.getmtime(data_path)
+    return version, read_excel_sheets(data_path)
 
 
-def _load_sheets(excel_path: str) -> Dict[str, pd.DataFrame]:
-    """Return all relevant sheets, using a cache invalidated by file mtime."""
-    mtime = os.path.getmtime(excel_path)
-    cached = _cache.get(excel_path)
-    if cached is not None and cached[0] == mtime:
+def _install(data_path: str, version: Any, sheets: Dict[str, pd.DataFrame]) -> None:
+    old = _cache.get(data_path)
+    _cache[data_path] = (version, sheets)
+    if old is not None and old[1] is not sheets:
+        _index_cache.pop(id(old[1]["cases"]), None)
+
+
+def _load_sheets(data_path: str) -> Dict[str, pd.DataFrame]:
+    """Return all relevant tables, using a cache invalidated by data version."""
+    cached = _cache.get(data_path)
+    if cached is not None and data_path in _pinned:
+        return cached[1]
+    version = data_version(data_path)
+    if cached is not None and cached[0] == version:
         return cached[1]
 
-    sheets = {
-        name: pd.read_excel(excel_path, sheet_name=name)
-        for name in [
-            "cases",
-            "summary_level_device",
-            "summary_level",
-            "summary_dir_top",
-            "summary_quality",
-            "summary_quality_level",
-            "summary_quality_owner_subdir",
-            "summary_pytest_decorators",
-        ]
-    }
-    _cache[excel_path] = (mtime, sheets)
+    version, sheets = _read_sheets(data_path)
+    _install(data_path, version, sheets)
     return sheets
 
 
+def refresh(data_path: str) -> Any:
+    """Load the version currently on disk, prepare it fully, then swap it in and pin `data_path`.
+
+    For a long-running server: called off the request path after each rebuild, so requests keep
+    serving the previous version until this one (tables and drill-down index) is ready.
+    """
+    version, sheets = _read_sheets(data_path)
+    df = sheets["cases"]
+    _index_cache[id(df)] = (df, _build_case_index(df))
+    _install(data_path, version, sheets)
+    _pinned[data_path] = time.time()
+    return version
+
+
+def clear_cache() -> None:
+    """Forget every loaded version, index and pin (cold-start measurements)."""
+    _cache.clear()
+    _pinned.clear()
+    _index_cache.clear()
+    _diff_cache.clear()
+
+
+def load_case_table(data_path: str) -> pd.DataFrame:
+    """The full `cases` sheet of a previous run (used to patch it incrementally)."""
+    return _load_sheets(data_path)["cases"]
+
+
+def run_meta(data_path: str) -> Dict[str, Any]:
+    """Metadata recorded with the data (tests_root, commit the tests were scanned at): the store's
+    current version, or the Excel side-car. Empty for data written without it."""
+    if is_store(data_path):
+        return read_store_meta(data_path, data_version(data_path))
+    return read_excel_meta(data_path)
+
+
+def run_tests_root(data_path: str) -> Optional[str]:
+    """Tests root the data's file paths live under, when recorded (see run_meta)."""
+    return run_meta(data_path).get("tests_root")
+
+
 # ---------------------------------------------------------------------------
 # Ordering helpers
 # ---------------------------------------------------------------------------
@@ -58,8 +135,8 @@ def _order_grades(cols):
 # Data-fetching functions (each returns a plain dict)
 # ---------------------------------------------------------------------------
 
-def fetch_level_device(excel_path: str) -> Dict[str, Any]:
-    sheets = _load_sheets(excel_path)
+def fetch_level_device(data_path: str) -> Dict[str, Any]:
+    sheets = _load_sheets(data_path)
     df_level_device = sheets["summary_level_device"]
     df_level = sheets["summary_level"]
 
@@ -79,8 +156,8 @@ def fetch_level_device(excel_path: str) -> Dict[str, Any]:
     return {"levels": levels, "devices": devices, "series": series}
 
 
-def fetch_dir_top(excel_path: str) -> Dict[str, Any]:
-    sheets = _load_sheets(excel_path)
+def fetch_dir_top(data_path: str) -> Dict[str, Any]:
+    sheets = _load_sheets(data_path)
     df = sheets["summary_dir_top"].head(20)
     return {
         "dirs": df["dir_group"].tolist(),
@@ -88,8 +165,8 @@ def fetch_dir_top(excel_path: str) -> Dict[str, Any]:
     }
 
 
-def fetch_quality(excel_path: str) -> Dict[str, Any]:
-    sheets = _load_sheets(excel_path)
+def fetch_quality(data_path: str) -> Dict[str, Any]:
+    sheets = _load_sheets(data_path)
     df_quality = sheets["summary_quality"]
     df_quality_level = sheets["summary_quality_level"]
 
@@ -111,8 +188,8 @@ def fetch_quality(excel_path: str) -> Dict[str, Any]:
     return {"grades": grades, "overall": overall, "levels": levels, "series": series}
 
 
-def fetch_quality_owner_table(excel_path: str) -> Dict[str, Any]:
-    sheets = _load_sheets(excel_path)
+def fetch_quality_owner_table(data_path: str) -> Dict[str, Any]:
+    sheets = _load_sheets(data_path)
     df = sheets["summary_quality_owner_subdir"].copy()
 
     if "owner_subdir" not in df.columns and "owner" in df.columns:
@@ -150,33 +227,140 @@ def fetch_quality_owner_table(excel_path: str) -> Dict[str, Any]:
     return {"grades": grades, "rows": rows}
 
 
-def fetch_pytest_decorators(excel_path: str) -> Dict[str, Any]:
-    sheets = _load_sheets(excel_path)
+def fetch_pytest_decorators(data_path: str) -> Dict[str, Any]:
+    sheets = _load_sheets(data_path)
     df = sheets["summary_pytest_decorators"]
     return {"rows": df.to_dict(orient="records")}
 
 
-def fetch_cases_by_level_device(excel_path: str, level: str, device: str) -> Dict[str, Any]:
-    """Return test cases matching a specific level and device (skip excluded)."""
-    sheets = _load_sheets(excel_path)
-    df = sheets["cases"]
-    # Exclude skipped tests (same filter as the Level×Device chart)
-    df = df[~df["is_skip"]]
-    # Filter by level
-    df = df[df["level"] == level]
-    # Filter by device — the devices column is comma-separated
-    df = df[df["devices"].str.contains(device, na=False)]
+# ---------------------------------------------------------------------------
+# Drill-down index: built once per data version so clicks are O(result)
+# ---------------------------------------------------------------------------
 
-    rows = df[["dir_group", "test", "level", "devices"]].to_dict(orient="records")
-    return {"level": level, "device": device, "total": len(rows), "rows": rows}
+@dataclass
+class _CaseIndex:
+    devices: List[str]                    # bit i of device_mask <-> devices[i]
+    device_mask: np.ndarray               # per case row
+    by_level_device: Dict[Tuple[str, str], np.ndarray]   # skip excluded
+    by_level_grade: Dict[Tuple[str, str], np.ndarray]    # no skip filter
+
+
+# id(cases DataFrame) -> (that DataFrame, its index); dropped when its version is replaced
+_index_cache: Dict[int, Tuple[pd.DataFrame, _CaseIndex]] = {}
+
+
+def _build_case_index(df: pd.DataFrame) -> _CaseIndex:
+    devices_csv = df["devices"].fillna("unknown").astype(str)
+    devices = _order_devices({d for v in devices_csv.unique() for d in v.split(",")})
+    bit = {d: 1 << i for i, d in enumerate(devices)}
+    # the CSV vocabulary is tiny, so map each distinct value once
+    distinct = devices_csv.unique()
+    mask_of = dict(zip(distinct, csv_masks(distinct, devices).tolist()))
+    device_mask = devices_csv.map(mask_of).to_numpy(dtype=np.int64)
+
+    runnable = ~df["is_skip"].astype(bool).to_numpy()
+    by_level_device: Dict[Tuple[str, str], np.ndarray] = {}
+    for level, pos in df.groupby("level", sort=False, observed=True).indices.items():
+        pos = pos[runnable[pos]]
+        masks = device_mask[pos]
+        for d in devices:
+            hit = pos[(masks & bit[d]) != 0]
+            if len(hit):
+                by_level_device[(level, d)] = hit
+
+    by_level_grade = dict(df.groupby(["level", "quality_grade"], sort=False, observed=True).indices)
+    return _CaseIndex(devices, device_mask, by_level_device, by_level_grade)
+
+
+def _case_index(data_path: str) -> Tuple[pd.DataFrame, _CaseIndex]:
+    df = _load_sheets(data_path)["cases"]
+    cached = _index_cache.get(id(df))
+    if cached is not None and cached[0] is df:
+        return df, cached[1]
+    index = _build_case_index(df)
+    current = _cache.get(data_path)
+    if current is not None and current[1]["cases"] is df:  # not swapped out meanwhile
+        _index_cache[id(df)] = (df, index)
+    return df, index
+
+
+_EMPTY = np.array([], dtype=np.intp)
+
+LEVEL_DEVICE_FIELDS = ["dir_group", "test", "level", "devices"]
+LEVEL_GRADE_FIELDS = ["dir_group", "test", "level", "quality_grade", "quality_score"]
+
+
+def _page(df: pd.DataFrame, pos: np.ndarray, default_fields: List[str],
+          offset: int, limit: Optional[int], fields: Optional[List[str]],
+          sort: Optional[str], descending: bool) -> Dict[str, Any]:
+    """Slice one page of the rows at `pos`; cost is bounded by the bucket size, not the table."""
+    fields = list(fields) if fields else list(default_fields)
+    unknown = [f for f in fields + ([sort] if sort else []) if f not in df.columns]
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(unknown)}")
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset and limit must be non-negative")
+
+    if sort:
+        keys = df[sort].to_numpy()[pos]
+        order = np.argsort(keys, kind="stable")
+        pos = pos[order[::-1]] if descending else pos[order]
+    end = len(pos) if limit is None else offset + limit
+    rows = df.iloc[pos[offset:end]][fields].to_dict(orient="records")
+    return {"total": int(len(pos)), "offset": offset, "limit": limit, "fields": fields, "rows": rows}
+
+
+def fetch_cases_by_level_device(data_path: str, level: str, device: str,
+                                offset: int = 0, limit: Optional[int] = None,
+                                fields: Optional[List[str]] = None,
+                                sort: Optional[str] = None, descending: bool = False) -> Dict[str, Any]:
+    """Return one page of test cases matching a specific level and device (skip excluded)."""
+    df, index = _case_index(data_path)
+    # Exact device membership (no substring matches on the comma-separated column)
+    pos = index.by_level_device.get((level, device), _EMPTY)
+    page = _page(df, pos, LEVEL_DEVICE_FIELDS, offset, limit, fields, sort, descending)
+    return {"level": level, "device": device, **page}
+
+
+def fetch_cases_by_level_grade(data_path: str, level: str, grade: str,
+                               offset: int = 0, limit: Optional[int] = None,
+                               fields: Optional[List[str]] = None,
+                               sort: Optional[str] = None, descending: bool = False) -> Dict[str, Any]:
+    """Return one page of test cases matching a specific level and quality grade (no skip filter)."""
+    df, index = _case_index(data_path)
+    pos = index.by_level_grade.get((level, grade), _EMPTY)
+    page = _page(df, pos, LEVEL_GRADE_FIELDS, offset, limit, fields, sort, descending)
+    return {"level": level, "grade": grade, **page}
 
 
-def fetch_cases_by_level_grade(excel_path: str, level: str, grade: str) -> Dict[str, Any]:
-    """Return test cases matching a specific level and quality grade (no skip filter)."""
-    sheets = _load_sheets(excel_path)
-    df = sheets["cases"]
-    df = df[df["level"] == level]
-    df = df[df["quality_grade"] == grade]
+# ---------------------------------------------------------------------------
+# Run-to-run diff against a baseline run, recomputed only when either side changes
+# ---------------------------------------------------------------------------
 
-    rows = df[["dir_group", "test", "level", "quality_grade", "quality_score"]].to_dict(orient="records")
-    return {"level": level, "grade": grade, "total": len(rows), "rows": rows}
+# (data_path, baseline_path) -> ((data version, baseline version), diff)
+_diff_cache: Dict[Tuple[str, str], Tuple[Tuple[Any, Any], CaseDiff]] = {}
+
+DIFF_FIELDS = ["file", "test", "status", "level_before", "level_after",
+               "devices_gained", "devices_lost", "grade_before", "grade_after", "downgraded"]
+
+
+def _case_diff(data_path: str, baseline_path: str) -> CaseDiff:
+    versions = (data_version(data_path), data_version(baseline_path))
+    cached = _diff_cache.get((data_path, baseline_path))
+    if cached is not None and cached[0] == versions:
+        return cached[1]
+    diff = diff_case_tables(load_case_table(baseline_path), load_case_table(data_path),
+                            run_tests_root(baseline_path), run_tests_root(data_path))
+    _diff_cache[(data_path, baseline_path)] = (versions, diff)
+    return diff
+
+
+def fetch_diff(data_path: str, baseline_path: str, kinds: Optional[List[str]] = None,
+               offset: int = 0, limit: Optional[int] = None,
+               fields: Optional[List[str]] = None,
+               sort: Optional[str] = None, descending: bool = False) -> Dict[str, Any]:
+    """Summary plus one page of the cases that changed between the baseline run and the current data."""
+    diff = _case_diff(data_path, baseline_path)
+    pos = np.flatnonzero(diff.mask(kinds))
+    page = _page(diff.changes, pos, DIFF_FIELDS, offset, limit, fields, sort, descending)
+    return {"summary": diff.summary(), "kinds": kinds or [], **page}
@@ -1,16 +1,73 @@
 """
 Author: Shawny
 """
-from typing import Dict, Iterable, Set
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+
+class DeviceMatcher:
+    """Device classification compiled once from config.yaml's device_keywords.
+
+    Each device gets one alternation regex over its keywords, and the per-marker result is
+    cached as a bitmask (bit i <-> devices[i]) since the marker vocabulary is tiny compared
+    to the number of cases.
+    """
+
+    def __init__(self, device_keywords: Dict[str, list[str]]):
+        self.devices: List[str] = list(device_keywords)
+        self._patterns = [(1 << i, re.compile("|".join(re.escape(k) for k in keys)))
+                          for i, keys in enumerate(device_keywords.values()) if keys]
+        self._marker_masks: Dict[str, int] = {}
+        self._set_masks: Dict[frozenset, int] = {}
+
+    def marker_mask(self, marker: str) -> int:
+        mask = self._marker_masks.get(marker)
+        if mask is None:
+            m = marker.lower()
+            mask = 0
+            for bit, pattern in self._patterns:
+                if pattern.search(m):
+                    mask |= bit
+            self._marker_masks[marker] = mask
+        return mask
+
+    def mask(self, markers: Iterable[str]) -> int:
+        if isinstance(markers, frozenset):
+            mask = self._set_masks.get(markers)
+            if mask is None:
+                mask = self._set_masks[markers] = self._mask(markers)
+            return mask
+        return self._mask(markers)
+
+    def _mask(self, markers: Iterable[str]) -> int:
+        mask = 0
+        for m in markers:
+            mask |= self.marker_mask(m)
+        return mask
+
+    def names(self, mask: int) -> Set[str]:
+        return {d for i, d in enumerate(self.devices) if mask & (1 << i)}
+
+
+@lru_cache(maxsize=8)
+def _matcher(frozen: Tuple[Tuple[str, Tuple[str, ...]], ...]) -> DeviceMatcher:
+    return DeviceMatcher({dev: list(keys) for dev, keys in frozen})
+
+
+def get_matcher(device_keywords: Dict[str, list[str]]) -> DeviceMatcher:
+    """Shared matcher per keyword configuration."""
+    return _matcher(tuple((dev, tuple(keys)) for dev, keys in device_keywords.items()))
+
 
 def devices_from_markers(markers: Iterable[str], device_keywords: Dict[str, list[str]]) -> Set[str]:
-    ms = {m.lower() for m in markers}
-    out: Set[str] = set()
+    matcher = get_matcher(device_keywords)
+    return matcher.names(matcher.mask(markers))
 
-    for dev, keys in device_keywords.items():
-        for m in ms:
-            if any(k in m for k in keys):
-                out.add(dev)
-                break
 
-    return out
+def csv_masks(values: Iterable[str], devices: List[str]) -> np.ndarray:
+    """Bitmasks (bit i <-> devices[i]) for comma-separated device strings, matching exact tokens."""
+    bit = {d: 1 << i for i, d in enumerate(devices)}
+    return np.array([sum(bit[d] for d in set(str(v).split(",")) if d in bit) for v in values], dtype=np.int64)
@@ -0,0 +1,206 @@
+"""
+Author: Shawny
+Run-to-run diff of two case tables, keyed by (file relative to the tests root, test).
+
+Both tables are factorized into integer keys and joined through a hash index, so the cost is
+a few vectorized passes over the rows; only the changed cases are materialized.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .device_map import csv_masks
+
+DIFF_COLUMNS = ["file", "test", "status",
+                "level_before", "level_after", "devices_before", "devices_after",
+                "devices_gained", "devices_lost", "grade_before", "grade_after",
+                "level_changed", "devices_changed", "grade_changed", "downgraded"]
+
+# --only / ?change= filters, in report order
+CHANGE_KINDS = ["added", "removed", "level", "devices", "grade", "downgraded"]
+
+GRADE_RANK = {"A": 0, "B": 1, "C": 2}
+UNKNOWN_DEVICE = "unknown"
+_LEVEL_NUM = re.compile(r"(\d+)")
+
+
+@dataclass
+class CaseDiff:
+    changes: pd.DataFrame     # DIFF_COLUMNS, one row per added / removed / changed test
+    unchanged: int            # tests present in both runs with no tracked difference
+
+    def summary(self) -> Dict[str, int]:
+        c = self.changes
+        return {
+            "added": int((c["status"] == "added").sum()),
+            "removed": int((c["status"] == "removed").sum()),
+            "level": int(c["level_changed"].sum()),
+            "devices": int(c["devices_changed"].sum()),
+            "grade": int(c["grade_changed"].sum()),
+            "downgraded": int(c["downgraded"].sum()),
+            "unchanged": self.unchanged,
+        }
+
+    def mask(self, kinds: Optional[List[str]] = None) -> np.ndarray:
+        """Rows matching any of `kinds` (all rows when empty)."""
+        c = self.changes
+        if not kinds:
+            return np.ones(len(c), dtype=bool)
+        unknown = [k for k in kinds if k not in CHANGE_KINDS]
+        if unknown:
+            raise ValueError(f"unknown change kind(s): {', '.join(unknown)}; expected {CHANGE_KINDS}")
+        cols = {"level": "level_changed", "devices": "devices_changed",
+                "grade": "grade_changed", "downgraded": "downgraded"}
+        hit = np.zeros(len(c), dtype=bool)
+        for k in kinds:
+            hit |= (c["status"] == k).to_numpy() if k in ("added", "removed") else c[cols[k]].to_numpy(dtype=bool)
+        return hit
+
+
+def _split(path: str) -> List[str]:
+    return [p for p in str(path).replace("\\", "/").split("/") if p]
+
+
+def relative_files(files: pd.Series, tests_root: Optional[str] = None) -> np.ndarray:
+    """Per-row file path relative to `tests_root` ("/"-separated).
+
+    Callers pass the root recorded with the run (data_service.run_tests_root). Without one
+    (data written before it was recorded), the deepest directory shared by all files is used, which is
+    the tests root only when the run covers more than one top-level test directory.
+    """
+    codes, uniques = pd.factorize(files, sort=False)
+    parts = [_split(u) for u in uniques]
+    if tests_root is not None:
+        root = _split(tests_root)
+    elif parts:
+        root = parts[0][:-1]
+        for p in parts[1:]:
+            n = 0
+            while n < len(root) and n < len(p) - 1 and root[n] == p[n]:
+                n += 1
+            root = root[:n]
+    else:
+        root = []
+    n = len(root)
+    rel = np.array(["/".join(p[n:]) if p[:n] == root else "/".join(p) for p in parts] or [""], dtype=object)
+    return rel[codes]
+
+
+def _joint_keys(a: pd.DataFrame, b: pd.DataFrame, root_a: Optional[str], root_b: Optional[str]):
+    """int64 key per row of a and b; equal keys <-> same (relative file, test)."""
+    rel = np.concatenate([relative_files(a["file"], root_a), relative_files(b["file"], root_b)])
+    tests = np.concatenate([a["test"].to_numpy(dtype=object), b["test"].to_numpy(dtype=object)])
+    file_codes, files = pd.factorize(rel)
+    test_codes, _ = pd.factorize(tests)
+    keys = file_codes.astype(np.int64) * (int(test_codes.max(initial=0)) + 1) + test_codes
+    return keys[:len(a)], keys[len(a):], rel
+
+
+def _last_per_key(keys: np.ndarray) -> np.ndarray:
+    """Row positions with duplicates dropped (a redefined test: the last definition wins)."""
+    return np.flatnonzero(~pd.Index(keys).duplicated(keep="last"))
+
+
+def _device_masks(values: pd.Series, devices: List[str]) -> np.ndarray:
+    csv = values.fillna(UNKNOWN_DEVICE).astype(str)
+    distinct = csv.unique()
+    mask_of = dict(zip(distinct, csv_masks(distinct, devices).tolist()))
+    return csv.map(mask_of).to_numpy(dtype=np.int64)
+
+
+def _mask_names(masks: np.ndarray, devices: List[str]) -> np.ndarray:
+    distinct = np.unique(masks)
+    name_of = {m: ",".join(d for i, d in enumerate(devices) if m >> i & 1) for m in distinct.tolist()}
+    return np.array([name_of[m] for m in masks.tolist()], dtype=object)
+
+
+def _level_rank(levels: np.ndarray) -> np.ndarray:
+    """levelN -> N; no level ranks below every level (it runs nowhere by level)."""
+    out = np.full(len(levels), np.iinfo(np.int64).max, dtype=np.int64)
+    for i, lv in enumerate(levels):
+        m = _LEVEL_NUM.search(lv) if isinstance(lv, str) else None
+        if m:
+            out[i] = int(m.group(1))
+    return out
+
+
+def _norm(values: pd.Series) -> np.ndarray:
+    return values.astype(object).where(values.notna(), "").to_numpy(dtype=object)
+
+
+def diff_case_tables(before: pd.DataFrame, after: pd.DataFrame,
+                     root_before: Optional[str] = None, root_after: Optional[str] = None) -> CaseDiff:
+    """Compare two case tables (the `cases` sheet / df_cases_all of two runs).
+
+    A matched test is reported when its level, device set or quality grade changed.
+    `downgraded` marks tests that got a worse grade, a higher level number (or lost their
+    level) or lost a device.
+    """
+    key_b, key_a, rel = _joint_keys(before, after, root_before, root_after)
+    rel_b, rel_a = rel[:len(before)], rel[len(before):]
+    keep_b, keep_a = _last_per_key(key_b), _last_per_key(key_a)
+
+    pos = pd.Index(key_a[keep_a]).get_indexer(key_b[keep_b])
+    matched = pos >= 0
+    mb = keep_b[matched]                     # rows of `before` present in both
+    ma = keep_a[pos[matched]]                # the same tests in `after`
+    removed = keep_b[~matched]
+    added = keep_a[pd.Index(key_b[keep_b]).get_indexer(key_a[keep_a]) < 0]
+
+    devices = sorted({d for v in pd.concat([before["devices"], after["devices"]]).dropna().astype(str).unique()
+                      for d in v.split(",")} - {UNKNOWN_DEVICE, ""})
+    dev_b = _device_masks(before["devices"], devices)
+    dev_a = _device_masks(after["devices"], devices)
+    lvl_b, lvl_a = _norm(before["level"]), _norm(after["level"])
+    grd_b, grd_a = _norm(before["quality_grade"]), _norm(after["quality_grade"])
+
+    level_changed = lvl_b[mb] != lvl_a[ma]
+    devices_changed = dev_b[mb] != dev_a[ma]
+    grade_changed = grd_b[mb] != grd_a[ma]
+    changed = level_changed | devices_changed | grade_changed
+    cb, ca = mb[changed], ma[changed]
+    lost = dev_b[cb] & ~dev_a[ca]
+    gained = dev_a[ca] & ~dev_b[cb]
+    worse_grade = (np.array([GRADE_RANK.get(g, len(GRADE_RANK)) for g in grd_a[ca]], dtype=np.int64)
+                   > np.array([GRADE_RANK.get(g, len(GRADE_RANK)) for g in grd_b[cb]], dtype=np.int64))
+    downgraded = worse_grade | (_level_rank(lvl_a[ca]) > _level_rank(lvl_b[cb])) | (lost != 0)
+
+    n_add, n_rem, n_chg = len(added), len(removed), len(cb)
+    empty = np.full(n_add + n_rem + n_chg, "", dtype=object)
+
+    def stack(rem, chg, add):
+        out = empty.copy()
+        out[:n_rem] = rem
+        out[n_rem:n_rem + n_chg] = chg
+        out[n_rem + n_chg:] = add
+        return out
+
+    def flags(values):
+        out = np.zeros(n_add + n_rem + n_chg, dtype=bool)
+        out[n_rem:n_rem + n_chg] = values
+        return out
+
+    no_rem, no_add = empty[:n_rem], empty[:n_add]
+    changes = pd.DataFrame({
+        "file": stack(rel_b[removed], rel_a[ca], rel_a[added]),
+        "test": stack(before["test"].to_numpy(dtype=object)[removed], after["test"].to_numpy(dtype=object)[ca],
+                      after["test"].to_numpy(dtype=object)[added]),
+        "status": stack("removed", "changed", "added"),
+        "level_before": stack(lvl_b[removed], lvl_b[cb], no_add),
+        "level_after": stack(no_rem, lvl_a[ca], lvl_a[added]),
+        "devices_before": stack(_mask_names(dev_b[removed], devices), _mask_names(dev_b[cb], devices), no_add),
+        "devices_after": stack(no_rem, _mask_names(dev_a[ca], devices), _mask_names(dev_a[added], devices)),
+        "devices_gained": stack(no_rem, _mask_names(gained, devices), no_add),
+        "devices_lost": stack(no_rem, _mask_names(lost, devices), no_add),
+        "grade_before": stack(grd_b[removed], grd_b[cb], no_add),
+        "grade_after": stack(no_rem, grd_a[ca], grd_a[added]),
+        "level_changed": flags(level_changed[changed]),
+        "devices_changed": flags(devices_changed[changed]),
+        "grade_changed": flags(grade_changed[changed]),
+        "downgraded": flags(downgraded),
+    }, columns=DIFF_COLUMNS)
+    changes = changes.sort_values(["file", "test"], kind="stable").reset_index(drop=True)
+    return CaseDiff(changes=changes, unchanged=int(len(mb) - n_chg))
@@ -0,0 +1,273 @@
+"""
+Author: Shawny
+Streaming parse engine — workers get size-balanced chunks of file paths, read and
+parse them themselves, and send back compact per-file results that the caller
+consumes as they arrive. Names travel as ids into a per-chunk vocabulary.
+"""
+import mmap
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .cache import content_digest
+from .parser import TestCaseMeta, extract_testcases_from_file, shared_names
+from .profiling import ChunkStats, current_rss, peak_rss, private_rss
+from .scanner import decode_source
+
+# (file_path, digest, status, rows) — rows is None when the content matched the expected digest
+FileResult = Tuple[str, str, str, Optional[List[tuple]]]
+
+# FileResult status values
+PARSED = "parsed"
+UNCHANGED = "unchanged"          # digest matched the cache, not parsed
+NO_TESTS = "no_tests"            # pre-filter found no `def test_`, not parsed
+SYNTAX_ERROR = "syntax_error"
+
+# The parser only records functions named test_* (top level or class methods), and every such
+# definition contains `def`, whitespace / line continuations, then `test_` (`async def` included).
+# Files without this byte pattern cannot yield cases, so they skip decoding and ast.parse.
+_TEST_DEF = re.compile(rb"def(?:[ \t\f]|\\(?:\r\n|\r|\n))+test_")
+# (file_path, size_bytes, expected_digest)
+WorkItem = Tuple[str, int, Optional[str]]
+
+# Chunks stay between these bounds; in between they are sized so every worker gets several.
+MIN_CHUNK_BYTES = 64 * 1024
+MAX_CHUNK_BYTES = 4 * 1024 * 1024
+MAX_CHUNK_FILES = 512
+# Fixed chunk size when the number of files is not known up front (streamed input)
+STREAM_CHUNK_BYTES = 256 * 1024
+
+# Rough resident size of one parse worker (interpreter, parser, one chunk's sources and ASTs), from the
+# per-worker peak_rss_mb of run reports; plan_workers fits the pool under a memory cap with it.
+WORKER_RSS_MB = 70
+MB = 1024 * 1024
+
+# Per-process state set once by _init_worker
+_level_re: Optional[re.Pattern] = None
+_mem_base: Optional[int] = None
+
+
+def _worker_mem() -> Optional[int]:
+    # private memory where available; a forked worker's RSS / high-water mark also counts the pages it
+    # still shares with the parent, which the parent's own RSS already includes
+    mem = private_rss()
+    return mem if mem is not None else peak_rss()
+
+
+def _init_worker(level_pattern: str) -> None:
+    global _level_re, _mem_base
+    _level_re = re.compile(level_pattern)
+    _mem_base = _worker_mem()
+
+
+def _read_candidate(py_path: str) -> Tuple[str, Optional[bytes]]:
+    """Return (digest, bytes) — bytes is None when the file cannot contain a test function.
+
+    The search runs over a memory map, so non-test files (helpers, data generators, large
+    generated modules) are never copied into Python memory.
+    """
+    with open(py_path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return content_digest(b""), None
+        with mm:
+            digest = content_digest(mm)
+            if _TEST_DEF.search(mm) is None:
+                return digest, None
+            return digest, mm[:]
+
+
+def parse_path(py_path: str, level_re: re.Pattern, expected_digest: Optional[str] = None) -> FileResult:
+    """Read one file, skip parsing if its digest is unchanged or it has no test_ functions, else extract rows."""
+    digest, data = _read_candidate(py_path)
+    return _parse_candidate(py_path, digest, data, level_re, expected_digest)
+
+
+def _parse_candidate(py_path: str, digest: str, data: Optional[bytes], level_re: re.Pattern,
+                     expected_digest: Optional[str]) -> FileResult:
+    if digest == expected_digest:
+        return py_path, digest, UNCHANGED, None
+    if data is None:
+        return py_path, digest, NO_TESTS, []
+    try:
+        cases = extract_testcases_from_file(py_path, decode_source(data), level_re)
+    except SyntaxError:
+        return py_path, digest, SYNTAX_ERROR, []
+    return py_path, digest, PARSED, [c.to_row() for c in cases]
+
+
+def _encode_chunk(results: List[FileResult]) -> tuple:
+    """Replace marker / decorator / level strings with small integer ids into a per-chunk vocabulary,
+    so each distinct name crosses the process boundary once."""
+    vocab: Dict[str, int] = {}
+
+    def ids(names) -> Tuple[int, ...]:
+        return tuple(vocab.setdefault(n, len(vocab)) for n in names)
+
+    encoded = []
+    for py_path, digest, status, rows in results:
+        if rows:
+            rows = [(name, -1 if level is None else vocab.setdefault(level, len(vocab)), ids(markers), ids(decs),
+                     assert_count, has_docstring, has_parametrize)
+                    for name, level, markers, decs, assert_count, has_docstring, has_parametrize in rows]
+        encoded.append((py_path, digest, status, rows))
+    return list(vocab), encoded
+
+
+def _decode_chunk(payload: tuple) -> Iterator[FileResult]:
+    vocab, encoded = payload[:2]
+    names = [sys.intern(n) for n in vocab]
+    for py_path, digest, status, rows in encoded:
+        if rows:
+            rows = [(name, None if level < 0 else names[level],
+                     shared_names(names[i] for i in markers), shared_names(names[i] for i in decs),
+                     assert_count, has_docstring, has_parametrize)
+                    for name, level, markers, decs, assert_count, has_docstring, has_parametrize in rows]
+        yield py_path, digest, status, rows
+
+
+def _parse_chunk(chunk: List[WorkItem]) -> tuple:
+    """Parse one chunk; returns (vocab, encoded results, ChunkStats with per-file read / parse times)."""
+    cpu0 = time.process_time()
+    results, times = [], []
+    for py_path, _, expected in chunk:
+        t0 = time.perf_counter()
+        digest, data = _read_candidate(py_path)
+        t1 = time.perf_counter()
+        results.append(_parse_candidate(py_path, digest, data, _level_re, expected))
+        times.append((py_path, t1 - t0, time.perf_counter() - t1))
+    t0 = time.perf_counter()
+    vocab, encoded = _encode_chunk(results)
+    encode_s = time.perf_counter() - t0
+    mem = _worker_mem()
+    growth = max(0, mem - _mem_base) if mem is not None and _mem_base is not None else None
+    return vocab, encoded, ChunkStats(os.getpid(), time.process_time() - cpu0, encode_s, times, peak_rss(), growth)
+
+
+def iter_chunks(items: Iterable[WorkItem], target_bytes: int) -> Iterator[List[WorkItem]]:
+    """Group files into chunks of roughly `target_bytes`, emitting each chunk as soon as it is full.
+
+    Many small files share one task (less IPC/pickling per file); one huge file gets a chunk of its own.
+    """
+    cur: List[WorkItem] = []
+    cur_bytes = 0
+    for item in items:
+        cur.append(item)
+        cur_bytes += item[1]
+        if cur_bytes >= target_bytes or len(cur) >= MAX_CHUNK_FILES:
+            yield cur
+            cur, cur_bytes = [], 0
+    if cur:
+        yield cur
+
+
+def chunk_by_size(items: Sequence[WorkItem], workers: int) -> List[List[WorkItem]]:
+    """Chunks sized from the known total so every worker gets several."""
+    total = sum(size for _, size, _ in items)
+    target = min(MAX_CHUNK_BYTES, max(MIN_CHUNK_BYTES, total // max(1, workers * 4)))
+    return list(iter_chunks(items, target))
+
+
+def plan_workers(workers: Optional[int] = None, memory_cap_mb: Optional[float] = None,
+                 reserved_mb: float = 0.0) -> int:
+    """Number of parse workers: `workers` (default one per CPU), reduced so that the workers fit in
+    `memory_cap_mb` next to `reserved_mb` already used by the main process. Never less than one."""
+    n = workers or os.cpu_count() or 1
+    if memory_cap_mb:
+        n = min(n, max(1, int((memory_cap_mb - reserved_mb) // WORKER_RSS_MB)))
+    return n
+
+
+def parse_pool(level_pattern: str, max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Worker pool for iter_parse; create one and pass it in to reuse workers across several scans."""
+    return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                               initializer=_init_worker, initargs=(level_pattern,))
+
+
+def iter_parse(items: Iterable[WorkItem],
+               level_pattern: str,
+               max_workers: Optional[int] = None,
+               pool: Optional[ProcessPoolExecutor] = None,
+               on_chunk: Optional[Callable[[ChunkStats], None]] = None,
+               memory_cap_mb: Optional[float] = None) -> Iterator[FileResult]:
+    """Parse (file_path, size, expected_digest) items on a process pool, yielding per-file results
+    as their chunk completes.
+
+    `items` may be a lazy iterable (e.g. fed by the directory walker): chunks are then cut at a
+    fixed size and submitted while the walk is still running. Workers are initialised once
+    (compiled level regex) and receive path-only chunks; submission is bounded so neither the
+    task queue nor finished results pile up in the parent. A caller-owned `pool` (see parse_pool,
+    created with the same level_pattern) is used as is and left running. `on_chunk` receives the
+    timing statistics of every finished chunk (see profiling.ParseProfile). `memory_cap_mb` throttles
+    submission once the workers' measured memory goes over it (see _run_chunks).
+    """
+    workers = max_workers or os.cpu_count() or 1
+    if isinstance(items, Sequence):
+        chunks = chunk_by_size(items, workers)
+    else:
+        chunks = iter_chunks(items, STREAM_CHUNK_BYTES)
+    if pool is not None:
+        yield from _run_chunks(pool, chunks, workers * 2, on_chunk, memory_cap_mb)
+        return
+    with parse_pool(level_pattern, workers) as own_pool:
+        yield from _run_chunks(own_pool, chunks, workers * 2, on_chunk, memory_cap_mb)
+
+
+def _finish(payload: tuple, on_chunk: Optional[Callable[[ChunkStats], None]]) -> Iterable[FileResult]:
+    if on_chunk is None:
+        return _decode_chunk(payload)
+    t0 = time.perf_counter()
+    results = list(_decode_chunk(payload))
+    stats = payload[2]
+    stats.decode_s = time.perf_counter() - t0
+    on_chunk(stats)
+    return results
+
+
+def _measured_mem(stats: ChunkStats, worker_mem: Dict[int, int]) -> int:
+    """Record the chunk's worker memory growth; returns this process's RSS plus every worker's growth, in bytes.
+
+    Growth since worker start (private memory where the OS reports it) leaves out the pages a forked
+    worker shares copy-on-write with this process, which would otherwise be counted once per worker.
+    """
+    if stats.mem_growth is not None:
+        worker_mem[stats.pid] = stats.mem_growth
+    return sum(worker_mem.values()) + (current_rss() or 0)
+
+
+def _run_chunks(pool: ProcessPoolExecutor, chunks: Iterable[List[WorkItem]], window: int,
+                on_chunk: Optional[Callable[[ChunkStats], None]] = None,
+                memory_cap_mb: Optional[float] = None) -> Iterator[FileResult]:
+    """Keep up to `window` chunks in flight.
+
+    With `memory_cap_mb`, the memory measured after every finished chunk (see _measured_mem) is checked
+    against the cap; once over it, only one chunk is kept in flight for the rest of the scan, so at most
+    one worker keeps allocating. Memory the workers already hold is not given back: a soft limit. The
+    chunk that started the throttling carries the measured bytes in ChunkStats.throttled_at.
+    """
+    pending = set()
+    worker_mem: Dict[int, int] = {}
+    for chunk in chunks:
+        pending.add(pool.submit(_parse_chunk, chunk))
+        while len(pending) >= window:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                payload = fut.result()
+                if memory_cap_mb and window > 1:
+                    used = _measured_mem(payload[2], worker_mem)
+                    if used > memory_cap_mb * MB:
+                        payload[2].throttled_at = used
+                        window = 1
+                yield from _finish(payload, on_chunk)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            yield from _finish(fut.result(), on_chunk)
+
+
+def rows_to_cases(py_path: str, rows: List[tuple]) -> List[TestCaseMeta]:
+    return [TestCaseMeta.from_row(py_path, r) for r in rows]
@@ -1,25 +1,135 @@
 """
 Author: Shawny
+Excel I/O — streaming (write-only) workbook generation and single-pass reading.
 """
+import json
+import math
+import os
 from pathlib import Path
+from typing import Any, Dict, Optional
+
 import pandas as pd
 
-def write_excel(path: str, **dfs) -> None:
+# (build_dataframes key, sheet/table name) — shared by the Excel writer, the columnar store and the data service
+SHEETS = [
+    ("df_cases_all", "cases"),
+    # main stats (skip removed)
+    ("df_level", "summary_level"),
+    ("df_level_device", "summary_level_device"),
+    ("df_dir_top", "summary_dir_top"),
+    # quality stats (no skipping)
+    ("df_quality", "summary_quality"),
+    ("df_quality_level", "summary_quality_level"),
+    ("df_quality_owner", "summary_quality_owner_subdir"),
+    # pytest decorator table
+    ("df_pytest_decorators", "summary_pytest_decorators"),
+]
+
+
+# run metadata (tests root, scanned commit) next to the workbook: stats.xlsx -> stats.xlsx.meta.json
+META_SUFFIX = ".meta.json"
+
+
+def _has_module(name: str) -> bool:
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False
+
+
+def _pick_write_engine(engine: str) -> str:
+    if engine == "auto":
+        return "xlsxwriter" if _has_module("xlsxwriter") else "openpyxl"
+    return engine
+
+
+def _pandas_has_calamine() -> bool:
+    # read_excel(engine="calamine") exists from pandas 2.2 on; requirements.txt allows 2.0
+    major, minor = (int(part) for part in pd.__version__.split(".")[:2])
+    return (major, minor) >= (2, 2)
+
+
+def _pick_read_engine(engine: str) -> str:
+    if engine == "auto":
+        return "calamine" if _pandas_has_calamine() and _has_module("python_calamine") else "openpyxl"
+    return engine
+
+
+def _iter_rows(df: pd.DataFrame):
+    """Rows as plain lists with NaN mapped to None (written as empty cells, like DataFrame.to_excel)."""
+    for row in df.itertuples(index=False, name=None):
+        yield [None if isinstance(v, float) and math.isnan(v) else v for v in row]
+
+
+def _write_openpyxl(out: Path, dfs: Dict[str, pd.DataFrame]) -> None:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for key, sheet in SHEETS:
+        ws = wb.create_sheet(sheet)
+        ws.append([str(c) for c in dfs[key].columns])
+        for row in _iter_rows(dfs[key]):
+            ws.append(row)
+    wb.save(out)
+
+
+def _write_xlsxwriter(out: Path, dfs: Dict[str, pd.DataFrame]) -> None:
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(str(out), {"constant_memory": True})
+    try:
+        for key, sheet in SHEETS:
+            ws = wb.add_worksheet(sheet)
+            ws.write_row(0, 0, [str(c) for c in dfs[key].columns])
+            for r, row in enumerate(_iter_rows(dfs[key]), start=1):
+                ws.write_row(r, 0, row)
+    finally:
+        wb.close()
+
+
+def write_excel(path: str, engine: str = "auto", meta: Optional[Dict[str, Any]] = None, **dfs) -> None:
+    """Write all sheets in streaming mode, row by row.
+
+    engine: "openpyxl" (write-only workbook), "xlsxwriter" (constant-memory mode), or "auto"
+    to use xlsxwriter when it is installed. The workbook is written to a temporary file next to
+    `path` and renamed over it, so readers never see a half-written file. `meta` goes to the
+    side-car file (see read_excel_meta); without it, a side-car of an earlier workbook is removed.
+    """
     out = Path(path)
     out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(f".{out.stem}.tmp{out.suffix}")
+
+    try:
+        if _pick_write_engine(engine) == "xlsxwriter":
+            _write_xlsxwriter(tmp, dfs)
+        else:
+            _write_openpyxl(tmp, dfs)
+        os.replace(tmp, out)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    side = out.with_name(out.name + META_SUFFIX)
+    if meta:
+        side_tmp = side.with_name(side.name + ".tmp")
+        side_tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(side_tmp, side)
+    elif side.exists():
+        side.unlink()
+
 
-    with pd.ExcelWriter(out, engine="openpyxl") as w:
-        dfs["df_cases_all"].to_excel(w, sheet_name="cases", index=False)
+def read_excel_meta(path: str) -> Dict[str, Any]:
+    """Run metadata written next to the workbook by write_excel; empty when there is none."""
+    try:
+        return json.loads(Path(path + META_SUFFIX).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
 
-        # main stats (skip removed)
-        dfs["df_level"].to_excel(w, sheet_name="summary_level", index=False)
-        dfs["df_level_device"].to_excel(w, sheet_name="summary_level_device", index=False)
-        dfs["df_dir_top"].to_excel(w, sheet_name="summary_dir_top", index=False)
 
-        # quality stats (no skipping)
-        dfs["df_quality"].to_excel(w, sheet_name="summary_quality", index=False)
-        dfs["df_quality_level"].to_excel(w, sheet_name="summary_quality_level", index=False)
-        dfs["df_quality_owner"].to_excel(w, sheet_name="summary_quality_owner_subdir", index=False)
+def read_excel_sheets(path: str, engine: str = "auto") -> Dict[str, pd.DataFrame]:
+    """Read every sheet in SHEETS with one pass over the workbook.
 
-        # pytest decorator table
-        dfs["df_pytest_decorators"].to_excel(w, sheet_name="summary_pytest_decorators", index=False)
+    engine: "openpyxl", "calamine" (python-calamine, much faster), or "auto".
+    """
+    names = [name for _, name in SHEETS]
+    return pd.read_excel(path, sheet_name=names, engine=_pick_read_engine(engine))
@@ -0,0 +1,56 @@
+"""
+Author: Shawny
+Ask git which test files changed between two commits (incremental mode).
+"""
+import subprocess
+from pathlib import Path, PurePosixPath
+from typing import List, Optional, Sequence, Tuple
+
+from .scanner import is_excluded
+
+
+def _git(repo_root: Path, *args: str) -> str:
+    res = subprocess.run(["git", "-C", str(repo_root), *args],
+                         capture_output=True, text=True, encoding="utf-8", check=False)
+    if res.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed: {res.stderr.strip()}")
+    return res.stdout
+
+
+def rev_parse(repo_root: Path, rev: str) -> str:
+    return _git(repo_root, "rev-parse", "--verify", f"{rev}^{{commit}}").strip()
+
+
+def changed_py_files(repo_root: Path, tests_dir: str, base: str, head: str = "HEAD",
+                     exclude: Sequence[str] = ()) -> Tuple[List[Path], List[Path]]:
+    """Return (added_or_modified, deleted) .py files under tests_dir between base and head.
+
+    Renames are reported as delete + add so both sides of the case table get patched. Files the
+    full scan skips (`exclude` globs, matched relative to tests_dir) are left out as well.
+    """
+    out = _git(repo_root, "diff", "--name-status", "-z", "--no-renames", base, head, "--", tests_dir)
+    fields = out.split("\0")
+    tests_prefix = PurePosixPath(Path(tests_dir).as_posix())
+    changed: List[Path] = []
+    deleted: List[Path] = []
+    for status, rel in zip(fields[0::2], fields[1::2]):
+        if not rel.endswith(".py") or Path(rel).name.startswith("."):
+            continue
+        if exclude and is_excluded(PurePosixPath(rel).relative_to(tests_prefix).as_posix(), exclude):
+            continue
+        path = repo_root / rel
+        if status.startswith("D"):
+            deleted.append(path)
+        else:
+            changed.append(path)
+    return changed, deleted
+
+
+def head_info(repo_root: Path) -> Tuple[Optional[str], Optional[str]]:
+    """(commit, branch) of HEAD, or (None, None) when repo_root is not a git checkout."""
+    try:
+        commit = _git(repo_root, "rev-parse", "HEAD").strip()
+        branch = _git(repo_root, "rev-parse", "--abbrev-ref", "HEAD").strip()
+    except (OSError, RuntimeError):
+        return None, None
+    return commit, (None if branch == "HEAD" else branch)
@@ -0,0 +1,227 @@
+"""
+Author: Shawny
+Append-only SQLite history of the summary tables, one snapshot per run, for trend charts.
+
+Every numeric cell of a summary table becomes one point of a series identified by
+(table, dimension values, metric), e.g. ("summary_level_device", "level=level0;device=npu", "cases")::
+
+    runs(run_id, ts, commit_sha, branch, total_cases)
+    series(series_id, tbl, dims, metric)
+    points(series_id, run_id, value)      -- WITHOUT ROWID, clustered by (series_id, run_id)
+
+A series over a year of daily runs is a single index range scan.
+"""
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from .excel import SHEETS
+
+# summary tables kept in the history (the per-case table is not)
+HISTORY_TABLES = [(key, table) for key, table in SHEETS if key != "df_cases_all"]
+
+AGGREGATES = {"last": None, "mean": "AVG", "min": "MIN", "max": "MAX"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY,
+    ts          INTEGER NOT NULL,
+    commit_sha  TEXT,
+    branch      TEXT,
+    total_cases INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_branch_ts ON runs (branch, ts);
+CREATE INDEX IF NOT EXISTS runs_ts ON runs (ts);
+CREATE TABLE IF NOT EXISTS series (
+    series_id INTEGER PRIMARY KEY,
+    tbl       TEXT NOT NULL,
+    dims      TEXT NOT NULL,
+    metric    TEXT NOT NULL,
+    UNIQUE (tbl, metric, dims)
+);
+CREATE TABLE IF NOT EXISTS points (
+    series_id INTEGER NOT NULL,
+    run_id    INTEGER NOT NULL,
+    value     NUMERIC NOT NULL,
+    PRIMARY KEY (series_id, run_id)
+) WITHOUT ROWID;
+"""
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")  # the dashboard can read while a run appends
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _dims_key(names: List[str], values) -> str:
+    return ";".join(f"{n}={v}" for n, v in zip(names, values))
+
+
+def _dims_dict(key: str) -> Dict[str, str]:
+    return dict(part.split("=", 1) for part in key.split(";")) if key else {}
+
+
+def _table_points(df: pd.DataFrame) -> List[Tuple[str, str, object]]:
+    """(dims, metric, value) for every numeric cell; non-numeric columns are the dimensions."""
+    metrics = [c for c in df.columns if is_numeric_dtype(df[c]) and df[c].dtype != bool]
+    dims = [c for c in df.columns if c not in metrics]
+    out = []
+    for row in df[dims + metrics].itertuples(index=False, name=None):
+        key = _dims_key(dims, row[:len(dims)])
+        for metric, value in zip(metrics, row[len(dims):]):
+            if pd.notna(value):
+                out.append((key, metric, value.item() if hasattr(value, "item") else value))
+    return out
+
+
+def _same_as_latest(conn: sqlite3.Connection, commit: Optional[str], branch: Optional[str], total: int,
+                    snapshot: Dict[Tuple[str, str, str], object]) -> bool:
+    """Whether the branch's latest run has this commit, total and exactly these (table, metric, dims) values."""
+    latest = conn.execute("SELECT run_id, commit_sha, total_cases FROM runs WHERE branch IS ? "
+                          "ORDER BY ts DESC, run_id DESC LIMIT 1", (branch,)).fetchone()
+    if latest is None or latest[1] != commit or latest[2] != total:
+        return False
+    # driven from `series`, so every lookup is a primary-key probe into points
+    previous = {(tbl, metric, dims): value for tbl, metric, dims, value in conn.execute(
+        "SELECT s.tbl, s.metric, s.dims, p.value FROM series s "
+        "JOIN points p ON p.series_id = s.series_id AND p.run_id = ?", (latest[0],))}
+    return previous == snapshot
+
+
+def record_run(db_path: str, dfs: Dict[str, pd.DataFrame], commit: Optional[str] = None,
+               branch: Optional[str] = None, ts: Optional[int] = None,
+               skip_unchanged: bool = False) -> Optional[int]:
+    """Append one snapshot of the summary tables; returns the new run_id.
+
+    With skip_unchanged, nothing is appended (and None returned) when the branch's latest run is
+    the same commit with identical values, e.g. stats rebuilt from an unchanged scan.
+    """
+    ts = int(time.time()) if ts is None else int(ts)
+    total = len(dfs["df_cases_all"])
+    snapshot = {(table, metric, dims): value for key, table in HISTORY_TABLES
+                for dims, metric, value in _table_points(dfs[key])}
+    with closing(_connect(db_path)) as conn, conn:
+        if skip_unchanged and _same_as_latest(conn, commit, branch, total, snapshot):
+            return None
+        run_id = conn.execute(
+            "INSERT INTO runs (ts, commit_sha, branch, total_cases) VALUES (?, ?, ?, ?)",
+            (ts, commit, branch, total)).lastrowid
+
+        known = {(tbl, metric, dims): sid for sid, tbl, dims, metric in conn.execute(
+            "SELECT series_id, tbl, dims, metric FROM series")}
+        rows = []
+        for (table, metric, dims), value in snapshot.items():
+            sid = known.get((table, metric, dims))
+            if sid is None:
+                sid = known[(table, metric, dims)] = conn.execute(
+                    "INSERT INTO series (tbl, dims, metric) VALUES (?, ?, ?)", (table, dims, metric)).lastrowid
+            rows.append((sid, run_id, value))
+        conn.executemany("INSERT INTO points (series_id, run_id, value) VALUES (?, ?, ?)", rows)
+    return run_id
+
+
+def parse_time(value: Optional[str]) -> Optional[int]:
+    """Unix seconds or an ISO date/datetime (UTC unless it carries an offset)."""
+    if value is None or value == "":
+        return None
+    if value.lstrip("-").isdigit():
+        return int(value)
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def _run_filter(branch: Optional[str], since: Optional[int], until: Optional[int]) -> Tuple[str, list]:
+    clauses, params = [], []
+    if branch is not None:
+        clauses.append("r.branch = ?")
+        params.append(branch)
+    if since is not None:
+        clauses.append("r.ts >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("r.ts <= ?")
+        params.append(until)
+    return (" AND ".join(clauses) or "1"), params
+
+
+def list_runs(db_path: str, branch: Optional[str] = None,
+              since: Optional[int] = None, until: Optional[int] = None) -> List[dict]:
+    where, params = _run_filter(branch, since, until)
+    with closing(_connect(db_path)) as conn:
+        rows = conn.execute(f"SELECT r.run_id, r.ts, r.commit_sha, r.branch, r.total_cases FROM runs r "
+                            f"WHERE {where} ORDER BY r.ts, r.run_id", params).fetchall()
+    return [{"run_id": run_id, "ts": ts, "commit": commit, "branch": br, "total_cases": total}
+            for run_id, ts, commit, br, total in rows]
+
+
+def list_series(db_path: str, table: Optional[str] = None) -> List[dict]:
+    with closing(_connect(db_path)) as conn:
+        sql = "SELECT tbl, metric, dims FROM series"
+        rows = conn.execute(sql + " WHERE tbl = ? ORDER BY metric, dims" if table else
+                            sql + " ORDER BY tbl, metric, dims", (table,) if table else ()).fetchall()
+    return [{"table": tbl, "metric": metric, "dims": _dims_dict(dims)} for tbl, metric, dims in rows]
+
+
+def fetch_series(db_path: str, table: str, metric: str, dims: Optional[Dict[str, str]] = None,
+                 branch: Optional[str] = None, since: Optional[int] = None, until: Optional[int] = None,
+                 points: Optional[int] = None, agg: str = "last") -> dict:
+    """Time series of `metric` in `table` for every series matching the `dims` filter.
+
+    With `points`, runs are grouped into that many equal time buckets and each bucket reports
+    `agg` (last / mean / min / max) at the time of its latest run. Runs where a series has no
+    row (e.g. a level with no cases) have no point.
+    """
+    if agg not in AGGREGATES:
+        raise ValueError(f"agg must be one of {sorted(AGGREGATES)}")
+    if points is not None and points < 1:
+        raise ValueError("points must be >= 1")
+    dims = dims or {}
+    where, params = _run_filter(branch, since, until)
+
+    with closing(_connect(db_path)) as conn:
+        matched = {}
+        for sid, key in conn.execute("SELECT series_id, dims FROM series WHERE tbl = ? AND metric = ?",
+                                     (table, metric)):
+            d = _dims_dict(key)
+            if all(d.get(k) == v for k, v in dims.items()):
+                matched[sid] = d
+        if not matched:
+            return {"table": table, "metric": metric, "agg": None, "series": []}
+
+        t0, t1, n_runs = conn.execute(f"SELECT MIN(r.ts), MAX(r.ts), COUNT(*) FROM runs r WHERE {where}",
+                                      params).fetchone()
+        ids = ",".join(str(sid) for sid in matched)
+        base = (f"FROM points p JOIN runs r ON r.run_id = p.run_id "
+                f"WHERE p.series_id IN ({ids}) AND {where}")
+        if points is None or n_runs <= points:
+            agg = None
+            sql = f"SELECT p.series_id, r.ts, p.value {base} ORDER BY p.series_id, r.ts, r.run_id"
+            bucket_params = []
+        else:
+            bucket = "((r.ts - ?) * ? / ?)"
+            bucket_params = [t0, points, t1 - t0 + 1]
+            func = AGGREGATES[agg]
+            # SQLite: with a lone MAX(), bare columns come from the row holding the maximum
+            value = f"{func}(p.value)" if func else "p.value"
+            sql = (f"SELECT p.series_id, MAX(r.ts), {value} {base} "
+                   f"GROUP BY p.series_id, {bucket} ORDER BY p.series_id, 2")
+        rows = conn.execute(sql, params + bucket_params).fetchall()
+
+    by_series: Dict[int, list] = {sid: [] for sid in matched}
+    for sid, ts, value in rows:
+        by_series[sid].append([ts, value])
+    return {
+        "table": table,
+        "metric": metric,
+        "agg": agg,
+        "series": [{"dims": matched[sid], "points": pts} for sid, pts in by_series.items()],
+    }
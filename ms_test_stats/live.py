@@ -0,0 +1,111 @@
+"""
+Author: Shawny
+Background rebuilds for a long-running dashboard (run.py --live).
+
+A daemon thread re-runs the scan on a schedule, or sooner when the watched test tree changes.
+The rebuild writes a new data version and installs it with data_service.refresh(), so requests
+keep serving the previous version and never wait for, or observe, a rebuild in progress.
+"""
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Optional
+
+
+class LiveRescanner:
+    def __init__(self, rebuild: Callable[[], Any],
+                 signature: Optional[Callable[[], str]] = None,
+                 rescan_interval: Optional[float] = None,
+                 poll_interval: float = 60.0):
+        """
+        rebuild:          scans, writes and publishes a new data version; returns that version
+        signature:        cheap fingerprint of the sources (e.g. scanner.tree_signature); a change
+                          triggers a rebuild at the next poll. None disables the watch trigger.
+        rescan_interval:  seconds between unconditional rebuilds; None for watch-only
+        poll_interval:    seconds between signature checks / schedule checks
+        """
+        self._rebuild = rebuild
+        self._signature = signature
+        self.rescan_interval = rescan_interval
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_signature: Optional[str] = None
+        self._last_build = time.time()
+        self._state: Dict[str, Any] = {
+            "version": None, "builds": 0, "failures": 0, "running": False,
+            "last_started": None, "last_finished": None, "last_duration_s": None,
+            "last_trigger": None, "last_error": None,
+        }
+
+    def start(self, version: Any = None) -> None:
+        """Start polling; `version` is the already published initial version."""
+        self._state["version"] = version
+        if self._signature is not None:
+            self._last_signature = self._signature()
+        self._thread = threading.Thread(target=self._loop, name="ms-test-stats-rescan", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def trigger(self) -> None:
+        """Request a rebuild at the next opportunity (coalesced with one already pending)."""
+        self._wake.set()
+
+    def status(self) -> Dict[str, Any]:
+        return dict(self._state)
+
+    def _due(self) -> Optional[str]:
+        if self._wake.is_set():
+            self._wake.clear()
+            return "manual"
+        if self.rescan_interval is not None and time.time() - self._last_build >= self.rescan_interval:
+            return "schedule"
+        if self._signature is not None:
+            sig = self._signature()
+            if sig != self._last_signature:
+                self._last_signature = sig
+                return "change"
+        return None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            if self._stop.is_set():
+                break
+            try:
+                trigger = self._due()
+            except Exception as e:  # e.g. tests_dir temporarily missing during a checkout
+                print(f"[WARN] Live watch failed: {e}")
+                continue
+            if trigger:
+                self._run(trigger)
+
+    def _run(self, trigger: str) -> None:
+        state = self._state
+        started = time.time()
+        state.update(running=True, last_started=started, last_trigger=trigger)
+        print(f"[OK] Live rebuild started ({trigger})")
+        try:
+            if self._signature is not None and trigger != "change":
+                # taken before scanning, so edits made during the rebuild trigger the next one
+                self._last_signature = self._signature()
+            state["version"] = self._rebuild()
+            state["builds"] += 1
+            state["last_error"] = None
+            print(f"[OK] Live rebuild published version {state['version']} in {time.time() - started:.1f}s")
+        except Exception as e:
+            # keep serving the previous version; the next trigger retries
+            state["failures"] += 1
+            state["last_error"] = f"{type(e).__name__}: {e}"
+            print(f"[WARN] Live rebuild failed, still serving version {state['version']}")
+            traceback.print_exc()
+        finally:
+            finished = time.time()
+            self._last_build = finished
+            state.update(running=False, last_finished=finished, last_duration_s=round(finished - started, 3))
@@ -2,21 +2,68 @@
 Author: Shawny
 """
 import ast
+import sys
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional, Set
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
 import re
 
+# Bump whenever extraction rules change so cached parse results are invalidated.
+# 2: deterministic level choice (_pick_level)
+PARSER_VERSION = 2
+
 @dataclass
 class TestCaseMeta:
-    file_path: str
+    # slotted: hundreds of thousands of these live in the parent process
+    __slots__ = ("file_path", "node_name", "level", "markers", "pytest_decorators",
+                 "assert_count", "has_docstring", "has_parametrize")
+
+    file_path: str                    # one shared string object per file
     node_name: str
     level: Optional[str]
-    markers: Set[str]                 # marker names only (e.g. level0, skip, parametrize)
-    pytest_decorators: List[str]           # full pytest decorator names (e.g. pytest.mark.parametrize); keeps duplicates
+    markers: FrozenSet[str]           # marker names only (e.g. level0, skip, parametrize); shared per distinct set
+    pytest_decorators: Tuple[str, ...]     # full pytest decorator names (e.g. pytest.mark.parametrize); keeps duplicates
     assert_count: int
     has_docstring: bool
     has_parametrize: bool
 
+    def to_row(self) -> tuple:
+        """Compact tuple form without file_path (stored once per file by callers)."""
+        return (self.node_name, self.level, sorted_names(self.markers), self.pytest_decorators,
+                self.assert_count, self.has_docstring, self.has_parametrize)
+
+    @classmethod
+    def from_row(cls, file_path: str, row: tuple) -> "TestCaseMeta":
+        name, level, markers, decs, assert_count, has_docstring, has_parametrize = row
+        return cls(file_path, name, level and sys.intern(level), shared_marker_set(markers),
+                   shared_names(decs), assert_count, has_docstring, has_parametrize)
+
+# ---------------------------------------------------------------------------
+# Interned vocabularies: the marker / decorator vocabulary is tiny compared to the
+# case count, so identical marker sets and decorator tuples share one object.
+# ---------------------------------------------------------------------------
+_name_tuples: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+_marker_sets: Dict[Tuple[str, ...], FrozenSet[str]] = {}
+_sorted_markers: Dict[FrozenSet[str], Tuple[str, ...]] = {}
+
+def shared_names(names: Iterable[str]) -> Tuple[str, ...]:
+    key = tuple(names)
+    shared = _name_tuples.get(key)
+    if shared is None:
+        shared = _name_tuples[key] = tuple(sys.intern(n) for n in key)
+    return shared
+
+def shared_marker_set(names: Iterable[str]) -> FrozenSet[str]:
+    key = shared_names(sorted(names))
+    shared = _marker_sets.get(key)
+    if shared is None:
+        shared = _marker_sets[key] = frozenset(key)
+        _sorted_markers[shared] = key
+    return shared
+
+def sorted_names(markers: Iterable[str]) -> Tuple[str, ...]:
+    key = _sorted_markers.get(markers) if isinstance(markers, frozenset) else None
+    return key if key is not None else shared_names(sorted(markers))
+
 def _dotted_name(expr: ast.AST) -> Optional[str]:
     if isinstance(expr, ast.Call):
         return _dotted_name(expr.func)
@@ -39,130 +86,131 @@ def _has_docstring(func: ast.AST) -> bool:
     )
 
 def _count_asserts(func: ast.AST) -> int:
+    """Count assert statements and assert*() calls anywhere in the function (same nodes as ast.walk).
+
+    Hand-rolled stack walk over node fields: much cheaper than ast.walk's generator chain,
+    which dominated per-file CPU after ast.parse itself.
+    """
     count = 0
-    for n in ast.walk(func):
-        if isinstance(n, ast.Assert):
+    AST, Assert, Call, Name, Attribute = ast.AST, ast.Assert, ast.Call, ast.Name, ast.Attribute
+    stack = [func]
+    pop, push, extend = stack.pop, stack.append, stack.extend
+    while stack:
+        n = pop()
+        if isinstance(n, Assert):
             count += 1
-        elif isinstance(n, ast.Call):
+        elif isinstance(n, Call):
             fn = n.func
             name = None
-            if isinstance(fn, ast.Name):
+            if isinstance(fn, Name):
                 name = fn.id
-            elif isinstance(fn, ast.Attribute):
+            elif isinstance(fn, Attribute):
                 name = fn.attr
             if name and name.lower().startswith("assert"):
                 count += 1
+        for field in n._fields:
+            if field == "ctx":
+                continue
+            v = getattr(n, field, None)
+            if isinstance(v, list):
+                extend([x for x in v if isinstance(x, AST)])
+            elif isinstance(v, AST):
+                push(v)
     return count
 
-def _build_alias_map(tree: ast.Module) -> Dict[str, str]:
-    aliases: Dict[str, str] = {}
-    for node in tree.body:
-        if not isinstance(node, ast.Assign):
-            continue
-        if len(node.targets) != 1 or not isinstance(node.targets[0], ast.Name):
-            continue
-        name = node.targets[0].id
-        dn = _dotted_name(node.value)
-        if dn and dn.startswith("pytest.mark."):
-            aliases[name] = dn
-    return aliases
-
-def _extract_pytest_decorators(decorators: Iterable[ast.AST], alias_map: Dict[str, str]) -> List[str]:
-    out: List[str] = []
-    for dec in decorators:
-        dn = _dotted_name(dec)
-        if not dn:
-            continue
-        if dn in alias_map:
-            dn = alias_map[dn]
-        if dn.startswith("pytest."):
-            out.append(dn)
-    return out
-
-def _extract_marks_from_decorators(decorators: Iterable[ast.AST], alias_map: Dict[str, str]) -> Set[str]:
-    out: Set[str] = set()
-    for dec in decorators:
-        dn = _dotted_name(dec)
-        if not dn:
-            continue
-        if dn in alias_map:
-            dn = alias_map[dn]
-        if dn.startswith("pytest.mark."):
-            out.add(dn.split("pytest.mark.", 1)[1])
-    return out
-
-def _extract_pytestmark(tree: ast.Module, alias_map: Dict[str, str]) -> Set[str]:
-    out: Set[str] = set()
-
-    def add_expr(e: ast.AST):
-        dn = _dotted_name(e)
-        if not dn:
-            return
-        if dn in alias_map:
-            dn = alias_map[dn]
-        if dn.startswith("pytest.mark."):
-            out.add(dn.split("pytest.mark.", 1)[1])
-
-    for node in tree.body:
-        if not isinstance(node, ast.Assign):
-            continue
-        targets = [t.id for t in node.targets if isinstance(t, ast.Name)]
-        if "pytestmark" not in targets:
-            continue
-        val = node.value
-        if isinstance(val, (ast.List, ast.Tuple)):
-            for elt in val.elts:
-                add_expr(elt)
-        else:
-            add_expr(val)
-
-    return out
-
-def _pick_level(markers: Set[str], level_re: re.Pattern) -> Optional[str]:
-    for m in markers:
+def _pick_level(ordered_marks: Iterable[str], level_re: re.Pattern) -> Optional[str]:
+    """First level marker in precedence order: the test's own decorators, then its class's, then the
+    module's pytestmark, each in source order. Never depends on set iteration (hash seed)."""
+    for m in ordered_marks:
         if level_re.match(m):
             return m
     return None
 
+_MARK_PREFIX = "pytest.mark."
+
+class _ModuleScan:
+    """Everything extract_testcases_from_file needs, collected in one pass over the module body.
+
+    Decorator names are derived once per decorator node; alias resolution is deferred until the
+    whole body has been seen (an alias may be assigned after its first use). Only test function
+    subtrees are descended into, once each, to count asserts.
+    """
+
+    def __init__(self, tree: ast.Module):
+        self.aliases: Dict[str, str] = {}
+        self.pytestmark: List[str] = []
+        # (name, own decorator names, class decorator names, assert_count, has_docstring)
+        self.tests: List[tuple] = []
+
+        for node in tree.body:
+            if isinstance(node, ast.Assign):
+                self._visit_assign(node)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                if node.name.startswith("test_"):
+                    self._add_test(node, node.name, ())
+            elif isinstance(node, ast.ClassDef):
+                class_decs = None
+                for item in node.body:
+                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name.startswith("test_"):
+                        if class_decs is None:
+                            class_decs = _decorator_names(node.decorator_list)
+                        self._add_test(item, f"{node.name}.{item.name}", class_decs)
+
+    def _visit_assign(self, node: ast.Assign) -> None:
+        targets = [t.id for t in node.targets if isinstance(t, ast.Name)]
+        if not targets:
+            return
+        if len(node.targets) == 1 and len(targets) == 1:
+            dn = _dotted_name(node.value)
+            if dn and dn.startswith(_MARK_PREFIX):
+                self.aliases[targets[0]] = dn
+        if "pytestmark" in targets:
+            val = node.value
+            elts = val.elts if isinstance(val, (ast.List, ast.Tuple)) else [val]
+            self.pytestmark.extend(dn for dn in map(_dotted_name, elts) if dn)
+
+    def _add_test(self, func: ast.AST, name: str, class_decs: Tuple[str, ...]) -> None:
+        self.tests.append((name, _decorator_names(func.decorator_list), class_decs,
+                           _count_asserts(func), _has_docstring(func)))
+
+def _decorator_names(decorators: Iterable[ast.AST]) -> Tuple[str, ...]:
+    return tuple(dn for dn in map(_dotted_name, decorators) if dn)
+
 def extract_testcases_from_file(py_path: str, source: str, level_re: re.Pattern) -> List[TestCaseMeta]:
     tree = ast.parse(source, filename=py_path)
+    scan = _ModuleScan(tree)
+    aliases = scan.aliases
 
-    alias_map = _build_alias_map(tree)
-    module_marks = _extract_pytestmark(tree, alias_map)
+    # per-file memo: decorator-name tuple -> (mark names in source order, pytest decorator names)
+    resolved: Dict[Tuple[str, ...], Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}
 
-    out: List[TestCaseMeta] = []
+    def resolve(names: Tuple[str, ...]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        hit = resolved.get(names)
+        if hit is None:
+            full = [aliases.get(dn, dn) for dn in names]
+            marks = tuple(dn[len(_MARK_PREFIX):] for dn in full if dn.startswith(_MARK_PREFIX))
+            hit = resolved[names] = (marks, tuple(dn for dn in full if dn.startswith("pytest.")))
+        return hit
 
-    def record_test(func: ast.AST, name: str, inherited_marks: Set[str], inherited_pytest_decs: List[str]):
-        func_marks = _extract_marks_from_decorators(getattr(func, "decorator_list", []), alias_map)
-        func_pytest = _extract_pytest_decorators(getattr(func, "decorator_list", []), alias_map)
+    module_marks, _ = resolve(tuple(scan.pytestmark))
 
-        markers = set(inherited_marks) | func_marks
-        pytest_decs = list(inherited_pytest_decs) + list(func_pytest)
+    out: List[TestCaseMeta] = []
+    for name, func_decs, class_decs, assert_count, has_docstring in scan.tests:
+        class_marks, class_pytest = resolve(class_decs)
+        func_marks, func_pytest = resolve(func_decs)
 
-        level = _pick_level(markers, level_re)
+        markers = set(module_marks) | set(class_marks) | set(func_marks)
+        level = _pick_level(func_marks + class_marks + module_marks, level_re)
 
         out.append(TestCaseMeta(
             file_path=py_path,
             node_name=name,
-            level=level,
-            markers=markers,
-            pytest_decorators=pytest_decs,
-            assert_count=_count_asserts(func),
-            has_docstring=_has_docstring(func),
+            level=level and sys.intern(level),
+            markers=shared_marker_set(markers),
+            pytest_decorators=shared_names(class_pytest + func_pytest),
+            assert_count=assert_count,
+            has_docstring=has_docstring,
             has_parametrize=("parametrize" in {m.lower() for m in markers}),
         ))
 
-    for node in tree.body:
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test_"):
-            record_test(node, node.name, module_marks, [])
-            continue
-
-        if isinstance(node, ast.ClassDef):
-            class_marks = module_marks | _extract_marks_from_decorators(node.decorator_list, alias_map)
-            class_pytest = _extract_pytest_decorators(node.decorator_list, alias_map)
-
-            for item in node.body:
-                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name.startswith("test_"):
-                    record_test(item, f"{node.name}.{item.name}", class_marks, class_pytest)
-
     return out
@@ -1,41 +1,72 @@
 """
 Author: Shawny
 """
-from pathlib import Path
-from typing import Optional, Tuple
+import os
+from functools import lru_cache
+from pathlib import Path, PurePath
+from typing import Dict, Optional, Tuple
 
+# (dir_group, owner_top, owner_subdir)
+Dims = Tuple[str, str, str]
 
-def _rel_parts(file_path: str, tests_root: str) -> Optional[Tuple[str, ...]]:
-    """Return relative path parts from tests_root, or None on failure."""
-    try:
-        rel = Path(file_path).resolve().relative_to(Path(tests_root).resolve())
-        return rel.parts if rel.parts else None
-    except Exception:
-        return None
+
+class PathDims:
+    """All directory groupings of a file, computed once per file against a pre-resolved tests root.
+
+    Files found by the scanner already live under tests_root, so the relative path is a string
+    slice; Path.resolve() (filesystem syscalls) is only used as a fallback, e.g. for symlinks.
+    """
+
+    def __init__(self, tests_root: str, dir_group_depth: int = 2):
+        self.dir_group_depth = dir_group_depth
+        root = Path(tests_root)
+        self._resolved_root = root.resolve()
+        self._prefixes = tuple({str(root.absolute()) + os.sep, str(self._resolved_root) + os.sep})
+        self._memo: Dict[str, Dims] = {}
+
+    def _rel_parts(self, file_path: str) -> Optional[Tuple[str, ...]]:
+        for prefix in self._prefixes:
+            if file_path.startswith(prefix):
+                parts = PurePath(file_path[len(prefix):]).parts
+                return parts if parts else None
+        try:
+            rel = Path(file_path).resolve().relative_to(self._resolved_root)
+            return rel.parts if rel.parts else None
+        except Exception:
+            return None
+
+    def __call__(self, file_path: str) -> Dims:
+        dims = self._memo.get(file_path)
+        if dims is None:
+            dims = self._memo[file_path] = self._compute(file_path)
+        return dims
+
+    def _compute(self, file_path: str) -> Dims:
+        parts = self._rel_parts(file_path)
+        if parts is None:
+            return "unknown", "unknown", "unknown"
+        # dir_group: first `dir_group_depth` directories (the file name itself never counts)
+        dirs = parts[:-1][:self.dir_group_depth]
+        group = "/".join(dirs) if dirs else "unknown"
+        subdir = f"{parts[0]}/{parts[1]}" if len(parts) >= 2 else parts[0]
+        return group, parts[0], subdir
+
+
+@lru_cache(maxsize=8)
+def path_dims(tests_root: str, dir_group_depth: int = 2) -> PathDims:
+    """Shared, memoizing PathDims per (tests_root, depth)."""
+    return PathDims(tests_root, dir_group_depth)
 
 
 def dir_group(file_path: str, tests_root: str) -> str:
-    parts = _rel_parts(file_path, tests_root)
-    if parts is None:
-        return "unknown"
-    if len(parts) >= 3:
-        return f"{parts[0]}/{parts[1]}"
-    if len(parts) >= 2:
-        return parts[0]
-    return "unknown"
+    return path_dims(tests_root)(file_path)[0]
 
 
 def owner_top(file_path: str, tests_root: str) -> str:
     "Top-level directory under tests/ (e.g. ut, st, perf_test)."
-    parts = _rel_parts(file_path, tests_root)
-    return parts[0] if parts else "unknown"
+    return path_dims(tests_root)(file_path)[1]
 
 
 def owner_subdir(file_path: str, tests_root: str) -> str:
     "Second-level owner group under tests/ (e.g. ut/python, st/networks)."
-    parts = _rel_parts(file_path, tests_root)
-    if parts is None:
-        return "unknown"
-    if len(parts) >= 2:
-        return f"{parts[0]}/{parts[1]}"
-    return parts[0]
+    return path_dims(tests_root)(file_path)[2]
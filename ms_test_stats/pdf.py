@@ -0,0 +1,112 @@
+"""
+Author: Shawny
+Render dashboards to PDF with Playwright (used by export_pdf.py and `python -m ms_test_stats export pdf`).
+
+The input is the self-contained static report (report.write_report), opened from a file:// URL, so
+no web server is started. Rendering waits for the template's `window.__chartsReady` signal instead of
+a fixed delay, and several reports are rendered through one browser instance.
+"""
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Tuple
+
+# upper bound on the wait for a page's load and its chart-ready signal (milliseconds)
+READY_TIMEOUT_MS = 30000
+PDF_OPTIONS = {
+    "format": "A4",
+    "print_background": True,
+    "margin": {"top": "1cm", "right": "1cm", "bottom": "1cm", "left": "1cm"},
+}
+
+
+def _as_url(source: str) -> str:
+    """http(s)/file URLs are used as is; anything else is a local HTML file."""
+    if source.startswith(("http://", "https://", "file://")):
+        return source
+    return Path(source).resolve().as_uri()
+
+
+@contextmanager
+def _browser() -> Iterator:
+    # Check if Playwright is installed
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        print("\n" + "="*70)
+        print("ERROR: Playwright is not installed")
+        print("="*70)
+        print("Please run the following commands to install:")
+        print("  pip install playwright")
+        print("  playwright install chromium")
+        print("="*70 + "\n")
+        sys.exit(1)
+
+    with sync_playwright() as p:
+        try:
+            browser = p.chromium.launch(headless=True)
+        except Exception as e:
+            error_msg = str(e)
+            if "Executable doesn't exist" in error_msg or "chrome-headless-shell" in error_msg:
+                print("\n" + "="*70)
+                print("ERROR: Playwright browser is not installed")
+                print("="*70)
+                print("Browser executable not found. Please run the following command to install:")
+                print("  playwright install chromium")
+                print("\nOr install all browsers:")
+                print("  playwright install")
+                print("="*70 + "\n")
+                sys.exit(1)
+            print(f"\n[ERROR] Failed to launch browser: {e}")
+            print("Please try running: playwright install chromium\n")
+            sys.exit(1)
+        try:
+            yield browser
+        finally:
+            browser.close()
+
+
+def _render(browser, url: str, output_path: str, timeout_ms: int) -> None:
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+    output_file = Path(output_path)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    print(f"[INFO] Rendering {url} -> {output_file}")
+
+    page = browser.new_page(viewport={"width": 1400, "height": 900})
+    errors = []
+    page.on("pageerror", lambda e: errors.append(str(e)))
+    page.add_init_script("window.__pdfExport = true;")
+    try:
+        page.goto(url, wait_until="load", timeout=timeout_ms)
+        try:
+            page.wait_for_function("window.__chartsReady === true", timeout=timeout_ms)
+        except PlaywrightTimeoutError as e:
+            detail = f"; page errors: {'; '.join(errors)}" if errors else " (is the ECharts CDN reachable?)"
+            raise RuntimeError(f"Charts of {url} did not finish rendering within {timeout_ms} ms{detail}") from e
+        page.pdf(path=str(output_file), **PDF_OPTIONS)
+    finally:
+        page.close()
+    print(f"[OK] PDF successfully saved to: {output_file}")
+
+
+def export_pdfs(jobs: Iterable[Tuple[str, str]], timeout_ms: int = READY_TIMEOUT_MS) -> int:
+    """Render every (HTML file or URL, PDF path) pair through one browser; returns the number written."""
+    n = 0
+    with _browser() as browser:
+        for source, output_path in jobs:
+            _render(browser, _as_url(source), output_path, timeout_ms)
+            n += 1
+    return n
+
+
+def export_webpage_to_pdf(url: str, output_path: str, timeout_ms: int = READY_TIMEOUT_MS) -> None:
+    """
+    Export a dashboard page (URL or local report.html) to a PDF file
+
+    Args:
+        url: The webpage URL or HTML file to export
+        output_path: Path for the output PDF file
+        timeout_ms: Upper bound on the wait for the page's charts, default 30000ms
+    """
+    export_pdfs([(url, output_path)], timeout_ms)
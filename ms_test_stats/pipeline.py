@@ -0,0 +1,271 @@
+"""
+Author: Shawny
+Pipeline stages shared by run.py, export_pdf.py and the ms_test_stats CLI: scan (walk + parallel parse
+with the parse cache), build the stats tables, write store / Excel / report, record history and the run report.
+
+run_pipeline() is the scan -> stats entry point. Worker count and memory cap come from config.yaml
+(parse_workers, memory_cap_mb).
+"""
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+from tqdm import tqdm
+
+from .artifact import save_cases
+from .cache import ContentIndex, ParseCache, config_fingerprint
+from .engine import (
+    NO_TESTS,
+    PARSED,
+    SYNTAX_ERROR,
+    UNCHANGED,
+    iter_parse,
+    parse_pool,
+    plan_workers,
+    rows_to_cases,
+)
+from .excel import write_excel
+from .gitdiff import head_info
+from .history import record_run
+from .profiling import RunProfile, current_rss, memory, peak_rss
+from .report import write_report
+from .scanner import FileEntry, walk_py_files
+from .stats import build_dataframes
+from .store import is_store, write_store
+
+MB = 1024 * 1024
+
+
+def tests_root_of(cfg) -> Path:
+    return Path(cfg["repo_root"]).resolve() / cfg.get("tests_dir", "tests")
+
+
+def level_pattern_of(cfg) -> str:
+    return cfg.get("level_regex", r"^level\d+$")
+
+
+def open_parse_cache(cfg) -> Optional[ParseCache]:
+    """The on-disk parse cache (parse_cache in config.yaml), or None when it is disabled."""
+    path = cfg.get("parse_cache", "output/parse_cache.pkl")
+    return ParseCache.load(path, config_fingerprint(level_pattern_of(cfg))) if path else None
+
+
+def scanned_commit(cfg) -> Optional[str]:
+    """HEAD of repo_root, recorded with everything a scan produces (None outside a git checkout)."""
+    return head_info(Path(cfg["repo_root"]).resolve())[0]
+
+
+def worker_count(cfg) -> int:
+    """parse_workers (default one per CPU), capped so the workers fit into memory_cap_mb.
+
+    That fit uses an estimate per worker (engine.WORKER_RSS_MB); parse_files enforces the cap on
+    measured worker memory by throttling submission during the scan.
+    """
+    return plan_workers(cfg.get("parse_workers"), cfg.get("memory_cap_mb"), (current_rss() or 0) / MB)
+
+
+def open_pool(cfg) -> ProcessPoolExecutor:
+    """Long-lived parse pool sized by worker_count, for callers that scan more than once."""
+    return parse_pool(level_pattern_of(cfg), worker_count(cfg))
+
+
+def scan(cfg, profile: RunProfile, cache: Optional[ParseCache], pool=None,
+         commit: Optional[str] = None) -> Dict[str, list]:
+    """Scan stage: walk repo_root/tests_dir and parse it on the worker pool, reusing `cache`;
+    writes the cases artifact (recording `commit`, default scanned_commit) and returns {file: cases}."""
+    workers = None
+    if pool is None:
+        workers = worker_count(cfg)
+        profile.extra["parse_workers"] = workers
+    return scan_tree(tests_root_of(cfg), level_pattern_of(cfg), cache, cfg.get("scan_exclude") or [], profile,
+                     pool, cfg.get("cases_artifact", "output/cases.pkl"), workers, cfg.get("memory_cap_mb"),
+                     commit=commit or scanned_commit(cfg))
+
+
+def run_pipeline(cfg, profile: RunProfile, cache: Optional[ParseCache], pool=None,
+                 commit: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+    """Scan and build the stats tables (see scan); the entry point for a full run."""
+    by_file = scan(cfg, profile, cache, pool, commit)
+    return build_stats(ordered_cases(by_file), cfg, tests_root_of(cfg), profile)
+
+
+def data_path_of(cfg) -> str:
+    """Where the current stats live: the columnar store if one was written, else the Excel file."""
+    out_store = cfg.get("output_store", "output/stats_store")
+    return out_store if out_store and is_store(out_store) else cfg.get("output_excel", "output/stats.xlsx")
+
+
+def parse_files(entries: Iterable[FileEntry], level_pattern: str, cache, profile: RunProfile,
+                pool=None, content: Optional[ContentIndex] = None, tests_root: Optional[Path] = None,
+                workers: Optional[int] = None, memory_cap_mb: Optional[float] = None) -> Dict[str, list]:
+    """Parse (path, mtime_ns, size) entries in worker processes (`workers` of them unless a `pool` is given),
+    throttled once the workers go over `memory_cap_mb`.
+
+    Entries may stream in from the directory walker: stat-level cache hits are taken directly,
+    the rest is handed to the parse pool right away (workers still skip files whose content is unchanged).
+    With a `content` index shared across the branches of a batch, a stale file of `tests_root` that is not
+    in the cache is also skipped when its content matches the file at the same relative path of an earlier
+    branch; the workers compare the digests, and results for content seen before reuse the stored rows.
+    """
+    by_file = {}
+    stat_of = {}
+    counts = Counter()
+    prefix = os.path.join(str(tests_root), "") if content is not None and tests_root is not None else None
+    mem_start = memory()
+    started = time.perf_counter()
+
+    def relative(path):
+        return path[len(prefix):] if prefix is not None and path.startswith(prefix) else None
+
+    def take(path, mtime_ns, size, digest, rows):
+        if content is not None:
+            rows = content.rows.setdefault(digest, rows)
+            rel = relative(path)
+            if rel is not None:
+                content.at[rel] = digest
+        if cache is not None:
+            cache.store_rows(path, mtime_ns, size, digest, rows)
+        by_file[path] = rows_to_cases(path, rows)
+
+    def expected_digest(path):
+        expected = cache.expected_digest(path) if cache is not None else None
+        if expected is None and content is not None:
+            expected = content.at.get(relative(path))
+        return expected
+
+    def stale_items():
+        for path, mtime_ns, size in entries:
+            counts["walked"] += 1
+            cached = cache.lookup(path, mtime_ns, size) if cache is not None else None
+            if cached is not None:
+                counts["cached"] += 1
+                by_file[path] = cached
+                continue
+            stat_of[path] = (mtime_ns, size)
+            yield path, size, expected_digest(path)
+        # the walk feeds the parse pool, so this stage overlaps with "parse"
+        profile.add_stage("walk", time.perf_counter() - started, mem_start=mem_start, files=counts["walked"])
+
+    throttled_before = profile.parse.throttled_at
+    with profile.stage("parse") as st:
+        results = iter_parse(stale_items(), level_pattern, workers, pool, on_chunk=profile.parse.add_chunk,
+                             memory_cap_mb=memory_cap_mb)
+        for py_path, digest, status, rows in tqdm(results, desc="Parsing"):
+            if rows is None:
+                if cache is not None and cache.expected_digest(py_path) == digest:
+                    rows = cache.rows(py_path)
+                else:  # same content as this path in an earlier branch
+                    status, rows = "deduplicated", content.rows[digest]
+            counts[status] += 1
+            take(py_path, *stat_of[py_path], digest, rows)
+        st.update(files=len(by_file), parsed=counts[PARSED], cases=sum(len(c) for c in by_file.values()))
+    if profile.parse.throttled_at is not None and throttled_before is None:
+        print(f"[WARN] Parse workers and main process used {profile.parse.throttled_at / MB:.0f} MB, over "
+              f"memory_cap_mb ({memory_cap_mb}); the rest was parsed one chunk at a time")
+    dedup = f"{counts['deduplicated']} deduplicated by content, " if content is not None else ""
+    print(f"[OK] {len(by_file)} files: {counts['cached']} cached, {dedup}{counts[PARSED]} parsed, "
+          f"{counts[UNCHANGED]} unchanged by content, {counts[NO_TESTS]} skipped (no test functions), "
+          f"{counts[SYNTAX_ERROR]} syntax errors")
+    return by_file
+
+
+def ordered_cases(by_file: Dict[str, list]) -> list:
+    # the walk order is not deterministic; emit cases in path order
+    cases = []
+    for path in sorted(by_file):
+        cases.extend(by_file[path])
+    return cases
+
+
+def scan_tree(tests_root: Path, level_pattern: str, cache, exclude, profile: RunProfile, pool=None,
+              cases_path: Optional[str] = None, workers: Optional[int] = None,
+              memory_cap_mb: Optional[float] = None, commit: Optional[str] = None) -> Dict[str, list]:
+    """Walk and parse tests_root; returns {file: cases} and saves the cache and, if given, the cases artifact
+    (recording `commit`, the checkout's HEAD, for run.py --since)."""
+    by_file = parse_files(walk_py_files(tests_root, exclude), level_pattern, cache, profile, pool,
+                          workers=workers, memory_cap_mb=memory_cap_mb)
+
+    if cache is not None:
+        with profile.stage("cache_save", entries=len(cache.entries)):
+            cache.prune(by_file, roots=[tests_root])
+            cache.save()
+    if cases_path:
+        with profile.stage("save_cases", files=len(by_file)):
+            save_cases(cases_path, by_file, str(tests_root), level_pattern, commit)
+        print(f"[OK] Parsed cases written to: {cases_path}")
+    return by_file
+
+
+def build_stats(cases: list, cfg, tests_root: Path, profile: RunProfile):
+    with profile.stage("build_dataframes", cases=len(cases)):
+        return build_dataframes(cases, cfg["device_keywords"], str(tests_root), cfg.get("dir_group_depth", 2))
+
+
+def write_data(cfg, dfs, out_excel: str, out_store: Optional[str], profile: RunProfile,
+               excel: bool = True, tests_root: Optional[Path] = None, commit: Optional[str] = None) -> str:
+    """Write the store (if configured) and Excel; returns the path the dashboard reads.
+
+    With excel=False the workbook is only written when there is no store to read from. Both record
+    `tests_root` (default: the configured one), so run diffs can key files relative to it, and
+    `commit`, the commit the tests were scanned at, which run.py --since patches from.
+    """
+    data_path = out_excel
+    rows = len(dfs["df_cases_all"])
+    meta = {"tests_root": str(tests_root or tests_root_of(cfg)), "commit": commit}
+    if out_store:
+        try:
+            with profile.stage("write_store", rows=rows):
+                write_store(out_store, meta=meta, **dfs)
+            data_path = out_store
+            print(f"[OK] Columnar store written to: {out_store}")
+        except ImportError as e:
+            print(f"[WARN] {e}; the dashboard will read from Excel")
+    if excel or data_path == out_excel:
+        with profile.stage("write_excel", rows=rows):
+            write_excel(out_excel, engine=cfg.get("excel_engine", "auto"), meta=meta, **dfs)
+        print(f"[OK] Excel written to: {out_excel}")
+    return data_path
+
+
+def write_outputs(cfg, dfs, out_excel: str, out_store: Optional[str], report_path: str,
+                  profile: RunProfile, tests_root: Optional[Path] = None, commit: Optional[str] = None) -> str:
+    """write_data plus the static report."""
+    data_path = write_data(cfg, dfs, out_excel, out_store, profile, tests_root=tests_root, commit=commit)
+    with profile.stage("write_report"):
+        write_report(data_path, report_path)
+    print(f"[OK] Static report written to: {report_path}")
+    return data_path
+
+
+def record_history(cfg, dfs, repo_root: Path, profile: RunProfile, branch: Optional[str] = None,
+                   skip_unchanged: bool = False) -> None:
+    """Append this run's summary tables to the trend history (history_db in config.yaml); with
+    skip_unchanged, not when they repeat the latest snapshot of the same commit (see history.record_run)."""
+    db = cfg.get("history_db", "output/history.sqlite")
+    if not db:
+        return
+    with profile.stage("history"):
+        commit, head_branch = head_info(repo_root)
+        Path(db).parent.mkdir(parents=True, exist_ok=True)
+        run_id = record_run(db, dfs, commit=commit, branch=branch or head_branch, skip_unchanged=skip_unchanged)
+    if run_id is None:
+        print(f"[OK] History unchanged since the latest snapshot of {(commit or 'this tree')[:10]}: {db}")
+    else:
+        print(f"[OK] History snapshot #{run_id} appended to: {db}")
+
+
+def write_run_report(cfg, profile: RunProfile) -> None:
+    cap = cfg.get("memory_cap_mb")
+    peak = peak_rss()
+    if cap and peak is not None and peak / MB > cap:
+        print(f"[WARN] Peak memory {peak / MB:.0f} MB of the main process exceeded memory_cap_mb ({cap}); "
+              f"lower parse_workers or raise the cap")
+    path = cfg.get("run_report", "output/run_report.json")
+    if path:
+        profile.write(path)
+        print(f"[OK] Run report written to: {path}")
+        profile.print_summary()
@@ -0,0 +1,360 @@
+"""
+Author: Shawny
+Run instrumentation: per-stage wall/CPU time, throughput and RSS, worker parse-time statistics,
+optional cProfile / pyinstrument capture, and request latency metrics for the Flask app.
+"""
+import bisect
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:  # not available on Windows
+    import resource
+except ImportError:
+    resource = None
+
+SLOWEST_FILES = 20
+# upper bounds (seconds) of the per-file parse-time histogram buckets; the last bucket is open
+PARSE_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+# upper bounds (seconds) of the request latency histogram (/metrics)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LATENCY_WINDOW = 1024
+
+
+def _mb(n_bytes: Optional[float]) -> Optional[float]:
+    return None if n_bytes is None else round(n_bytes / (1024 * 1024), 1)
+
+
+def peak_rss() -> Optional[int]:
+    """High-water mark of this process's resident set, in bytes (None when unavailable)."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss)
+    except ImportError:
+        return None
+
+
+def private_rss() -> Optional[int]:
+    """Memory held by this process alone (Private_* of /proc/self/smaps_rollup, Linux), without the pages
+    a forked worker still shares copy-on-write with its parent; None where that is not available."""
+    try:
+        with open("/proc/self/smaps_rollup", "rb") as f:
+            return sum(int(line.split()[1]) for line in f if line.startswith(b"Private_")) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def current_rss() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def memory() -> Tuple[Optional[int], Optional[int]]:
+    """(current RSS, lifetime peak RSS) of this process in bytes, for per-stage deltas."""
+    return current_rss(), peak_rss()
+
+
+def _histogram(values: List[float], bounds: Tuple[float, ...]) -> Dict[str, int]:
+    counts = [0] * (len(bounds) + 1)
+    for v in values:
+        counts[bisect.bisect_left(bounds, v)] += 1
+    labels = [f"<={b * 1000:g}ms" for b in bounds] + [f">{bounds[-1] * 1000:g}ms"]
+    return dict(zip(labels, counts))
+
+
+class ParseProfile:
+    """Statistics of the parse workers, fed one chunk at a time by engine.iter_parse(on_chunk=...)."""
+
+    def __init__(self, slowest: int = SLOWEST_FILES):
+        self.slowest_n = slowest
+        self._slowest: List[Tuple[float, str, float, float]] = []   # min-heap of (total, path, read, parse)
+        self._workers: Dict[int, Dict[str, Any]] = {}
+        self.chunks = 0
+        self.encode_s = 0.0
+        self.decode_s = 0.0
+        self.payload_bytes = 0
+        self.throttled_at: Optional[int] = None   # measured bytes when memory_cap_mb throttling started
+
+    def add_chunk(self, stats: "ChunkStats") -> None:
+        self.chunks += 1
+        self.encode_s += stats.encode_s
+        self.decode_s += stats.decode_s
+        w = self._workers.setdefault(stats.pid, {"chunks": 0, "files": 0, "cpu_s": 0.0,
+                                                 "read_s": 0.0, "parse_s": 0.0, "times": [],
+                                                 "peak_rss": None, "mem_growth": None})
+        w["chunks"] += 1
+        w["cpu_s"] += stats.cpu_s
+        if stats.peak_rss is not None:
+            w["peak_rss"] = max(w["peak_rss"] or 0, stats.peak_rss)
+        if stats.mem_growth is not None:
+            w["mem_growth"] = max(w["mem_growth"] or 0, stats.mem_growth)
+        if stats.throttled_at is not None and self.throttled_at is None:
+            self.throttled_at = stats.throttled_at
+        for path, read_s, parse_s in stats.files:
+            total = read_s + parse_s
+            w["files"] += 1
+            w["read_s"] += read_s
+            w["parse_s"] += parse_s
+            w["times"].append(total)
+            item = (total, path, read_s, parse_s)
+            if len(self._slowest) < self.slowest_n:
+                heapq.heappush(self._slowest, item)
+            elif total > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def report(self) -> Dict[str, Any]:
+        workers = {}
+        for pid, w in sorted(self._workers.items()):
+            workers[str(pid)] = {
+                "chunks": w["chunks"], "files": w["files"], "cpu_s": round(w["cpu_s"], 3),
+                "read_s": round(w["read_s"], 3), "parse_s": round(w["parse_s"], 3),
+                "peak_rss_mb": _mb(w["peak_rss"]),
+                "mem_growth_mb": _mb(w["mem_growth"]),
+                "histogram": _histogram(w["times"], PARSE_BUCKETS),
+            }
+        return {
+            "chunks": self.chunks,
+            "files": sum(w["files"] for w in self._workers.values()),
+            "worker_cpu_s": round(sum(w["cpu_s"] for w in self._workers.values()), 3),
+            "encode_s": round(self.encode_s, 3),
+            "decode_s": round(self.decode_s, 3),
+            "throttled_at_mb": _mb(self.throttled_at),
+            "workers": workers,
+            "slowest_files": [{"file": path, "seconds": round(total, 4), "read_s": round(r, 4),
+                               "parse_s": round(p, 4)}
+                              for total, path, r, p in sorted(self._slowest, reverse=True)],
+        }
+
+
+class ChunkStats:
+    """Timing of one parse chunk: measured in the worker, decode_s and throttled_at filled in by the parent."""
+    __slots__ = ("pid", "cpu_s", "encode_s", "decode_s", "files", "peak_rss", "mem_growth", "throttled_at")
+
+    def __init__(self, pid: int, cpu_s: float, encode_s: float, files: List[Tuple[str, float, float]],
+                 peak_rss: Optional[int] = None, mem_growth: Optional[int] = None):
+        self.pid = pid
+        self.cpu_s = cpu_s
+        self.encode_s = encode_s
+        self.decode_s = 0.0
+        self.files = files              # (path, read_s, parse_s)
+        self.peak_rss = peak_rss        # worker's high-water mark after this chunk, bytes
+        self.mem_growth = mem_growth    # memory the worker holds beyond what it started with, bytes
+        self.throttled_at = None        # set on the chunk after which memory_cap_mb throttling started
+
+
+class RunProfile:
+    """Per-stage timings of one run, written as a JSON report next to the outputs."""
+
+    def __init__(self, name: str = "run"):
+        self.name = name
+        self.started = time.time()
+        self.stages: List[Dict[str, Any]] = []
+        self.parse = ParseProfile()
+        self.extra: Dict[str, Any] = {}
+
+    @contextmanager
+    def stage(self, name: str, **counts) -> Iterator[Dict[str, Any]]:
+        """Time a block; add item counts (files=, cases=, rows=) to the yielded dict for throughput."""
+        counts = dict(counts)
+        mem0 = memory()
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield counts
+        finally:
+            self.add_stage(name, time.perf_counter() - wall0, time.process_time() - cpu0, mem0, **counts)
+
+    def add_stage(self, name: str, wall_s: float, cpu_s: Optional[float] = None,
+                  mem_start: Optional[Tuple[Optional[int], Optional[int]]] = None, **counts) -> None:
+        """Record a stage; `mem_start` is memory() at its start, for the RSS change and peak rise."""
+        entry: Dict[str, Any] = {"stage": name, "wall_s": round(wall_s, 4)}
+        if cpu_s is not None:
+            entry["cpu_s"] = round(cpu_s, 4)
+        for key, n in counts.items():
+            entry[key] = n
+            if isinstance(n, (int, float)) and wall_s > 0:
+                entry[f"{key}_per_s"] = round(n / wall_s, 1)
+        rss, peak = memory()
+        if mem_start is not None:
+            entry["rss_start_mb"] = _mb(mem_start[0])
+        entry["rss_mb"] = _mb(rss)
+        if mem_start is not None and peak is not None and mem_start[1] is not None:
+            # the process high-water mark is a lifetime value; only its rise belongs to this stage
+            entry["peak_rise_mb"] = _mb(peak - mem_start[1])
+        self.stages.append(entry)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "argv": sys.argv,
+            "started": self.started,
+            "wall_s": round(time.time() - self.started, 3),
+            "peak_rss_mb": _mb(peak_rss()),
+            "stages": self.stages,
+            "parse": self.parse.report(),
+            **self.extra,
+        }
+
+    def write(self, path: str) -> Dict[str, Any]:
+        report = self.report()
+        out = Path(path)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out.with_name(out.name + ".tmp")
+        tmp.write_text(json.dumps(report, indent=1, default=str), encoding="utf-8")
+        os.replace(tmp, out)
+        return report
+
+    def print_summary(self) -> None:
+        for s in self.stages:
+            rates = ", ".join(f"{k[:-6]} {v:g}/s" for k, v in s.items() if k.endswith("_per_s"))
+            cpu = f" cpu {s['cpu_s']:.2f}s" if "cpu_s" in s else ""
+            mem = f" rss {s['rss_mb']} MB" if s.get("rss_mb") is not None else ""
+            if s.get("rss_start_mb") is not None and mem:
+                mem = f" rss {s['rss_start_mb']}->{s['rss_mb']} MB"
+            if s.get("peak_rise_mb"):
+                mem += f" peak +{s['peak_rise_mb']} MB"
+            print(f"  {s['stage']:<18} {s['wall_s']:8.2f}s{cpu}{mem}{'  ' + rates if rates else ''}")
+        slow = self.parse.report()["slowest_files"][:5]
+        if slow:
+            print("  slowest files: " + ", ".join(f"{Path(x['file']).name} {x['seconds'] * 1000:.0f}ms"
+                                                  for x in slow))
+
+
+@contextmanager
+def capture(kind: Optional[str], out_dir: str) -> Iterator[Optional[str]]:
+    """Profile the enclosed block with cProfile (-> profile.pstats) or pyinstrument (-> profile.html).
+
+    Only the parent process is profiled; worker parse time is covered by ParseProfile.
+    """
+    if not kind:
+        yield None
+        return
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    if kind == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError as e:
+            raise ImportError("--profile pyinstrument needs pyinstrument: pip install pyinstrument") from e
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield str(out / "profile.html")
+        finally:
+            profiler.stop()
+            (out / "profile.html").write_text(profiler.output_html(), encoding="utf-8")
+            print(f"[OK] pyinstrument profile written to: {out / 'profile.html'}")
+        return
+
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield str(out / "profile.pstats")
+    finally:
+        profiler.disable()
+        profiler.dump_stats(out / "profile.pstats")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+        print(f"[OK] cProfile stats written to: {out / 'profile.pstats'}")
+
+
+class RequestMetrics:
+    """Per-endpoint request counts and latencies, exposed by the webapp at /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (endpoint rule, method) -> stats
+        self._stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.started = time.time()
+
+    def observe(self, endpoint: str, method: str, status: int, seconds: float) -> None:
+        with self._lock:
+            s = self._stats.get((endpoint, method))
+            if s is None:
+                s = self._stats[(endpoint, method)] = {
+                    "count": 0, "sum": 0.0, "max": 0.0, "statuses": {},
+                    "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+                    "recent": deque(maxlen=LATENCY_WINDOW),
+                }
+            s["count"] += 1
+            s["sum"] += seconds
+            s["max"] = max(s["max"], seconds)
+            s["statuses"][status] = s["statuses"].get(status, 0) + 1
+            s["buckets"][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            s["recent"].append(seconds)
+
+    def install(self, app) -> None:
+        from flask import g, request
+
+        @app.before_request
+        def _start_timer():
+            g._metrics_t0 = time.perf_counter()
+
+        @app.after_request
+        def _record(response):
+            t0 = getattr(g, "_metrics_t0", None)
+            if t0 is not None:
+                rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+                self.observe(rule, request.method, response.status_code, time.perf_counter() - t0)
+            return response
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            items = [(k, dict(v, recent=sorted(v["recent"]), statuses=dict(v["statuses"])))
+                     for k, v in self._stats.items()]
+        endpoints = []
+        for (endpoint, method), s in sorted(items):
+            recent = s["recent"]
+
+            def pct(q):
+                return round(recent[min(len(recent) - 1, int(q * len(recent)))] * 1000, 3) if recent else None
+            endpoints.append({
+                "endpoint": endpoint, "method": method, "count": s["count"],
+                "avg_ms": round(s["sum"] / s["count"] * 1000, 3), "max_ms": round(s["max"] * 1000, 3),
+                "p50_ms": pct(0.5), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+                "statuses": {str(k): v for k, v in sorted(s["statuses"].items())},
+            })
+        return {"uptime_s": round(time.time() - self.started, 1), "endpoints": endpoints}
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition of the latency histograms and status counters."""
+        with self._lock:
+            items = sorted((k, dict(v, buckets=list(v["buckets"]), statuses=dict(v["statuses"])))
+                           for k, v in self._stats.items())
+        lines = ["# HELP ms_test_stats_request_seconds Request latency by endpoint.",
+                 "# TYPE ms_test_stats_request_seconds histogram"]
+        for (endpoint, method), s in items:
+            labels = f'endpoint="{endpoint}",method="{method}"'
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS + (float("inf"),), s["buckets"]):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'ms_test_stats_request_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"ms_test_stats_request_seconds_sum{{{labels}}} {s['sum']:.6f}")
+            lines.append(f"ms_test_stats_request_seconds_count{{{labels}}} {s['count']}")
+        lines += ["# HELP ms_test_stats_requests_total Requests by endpoint and status.",
+                  "# TYPE ms_test_stats_requests_total counter"]
+        for (endpoint, method), s in items:
+            for status, n in sorted(s["statuses"].items()):
+                lines.append(f'ms_test_stats_requests_total{{endpoint="{endpoint}",method="{method}",'
+                             f'status="{status}"}} {n}')
+        return "\n".join(lines) + "\n"
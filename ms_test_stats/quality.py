@@ -3,7 +3,9 @@ Author: Shawny
 """
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Set
+from typing import Set, Tuple
+
+import numpy as np
 
 SKIP_MARKS = {"skip", "skipif", "xfail"}
 
@@ -35,3 +37,13 @@ def score_test_case(assert_count: int, has_parametrize: bool, has_docstring: boo
         grade = "C"
 
     return QualityResult(score=score, grade=grade)
+
+
+def score_arrays(assert_count: np.ndarray, has_parametrize: np.ndarray, has_docstring: np.ndarray,
+                 has_skip_mark: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized score_test_case over whole columns; returns (scores, grades)."""
+    score = ((assert_count >= 1) * 2 + (assert_count >= 3)
+             + has_parametrize.astype(np.int64) + has_docstring.astype(np.int64)
+             - has_skip_mark.astype(np.int64))
+    grade = np.where(score >= 4, "A", np.where(score >= 2, "B", "C"))
+    return score.astype(np.int64), grade
@@ -3,6 +3,7 @@ Author: Shawny
 """
 from pathlib import Path
 import json
+import os
 
 from ms_test_stats.data_service import (
     fetch_level_device,
@@ -13,16 +14,16 @@ from ms_test_stats.data_service import (
 )
 
 
-def write_report(excel_path: str, html_path: str) -> None:
-    """Generate a static HTML report from Excel data."""
+def write_report(data_path: str, html_path: str) -> None:
+    """Generate a static HTML report from the stats data (columnar store or Excel)."""
     out_html = Path(html_path)
     out_html.parent.mkdir(parents=True, exist_ok=True)
 
-    data_level_device = fetch_level_device(excel_path)
-    data_dir_top = fetch_dir_top(excel_path)
-    data_quality = fetch_quality(excel_path)
-    data_quality_owner = fetch_quality_owner_table(excel_path)
-    data_pytest = fetch_pytest_decorators(excel_path)
+    data_level_device = fetch_level_device(data_path)
+    data_dir_top = fetch_dir_top(data_path)
+    data_quality = fetch_quality(data_path)
+    data_quality_owner = fetch_quality_owner_table(data_path)
+    data_pytest = fetch_pytest_decorators(data_path)
 
     # Generate HTML with inline data
     html_template = Path(__file__).resolve().parent.parent / "templates" / "index.html"
@@ -53,4 +54,7 @@ def write_report(excel_path: str, html_path: str) -> None:
     # Remove async/await since we're using inline data
     html_content = html_content.replace('async function main() {', 'function main() {')
 
-    out_html.write_text(html_content, encoding="utf-8")
+    # write-then-rename: a browser refreshing the report never gets a truncated page
+    tmp = out_html.with_name(out_html.name + ".tmp")
+    tmp.write_text(html_content, encoding="utf-8")
+    os.replace(tmp, out_html)
@@ -1,16 +1,100 @@
 """
 Author: Shawny
 """
+import hashlib
+import os
+import queue
+import threading
 from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
 from tqdm import tqdm
 
-def iter_py_files(tests_root: Path) -> Iterable[Path]:
-    for p in tests_root.rglob("*.py"):
-        if p.name.startswith("."):
-            continue
-        yield p
+# (path, mtime_ns, size) — stat info taken from the directory entry
+FileEntry = Tuple[str, int, int]
+
+
+def _excluded(name: str, rel: str, exclude: Sequence[str]) -> bool:
+    """A glob excludes an entry if it matches its name (e.g. __pycache__) or its path
+    relative to the tests root (e.g. ut/python/dataset/data)."""
+    return any(fnmatch(name, pat) or fnmatch(rel, pat) for pat in exclude)
+
+
+def is_excluded(rel_path: str, exclude: Sequence[str]) -> bool:
+    """Whether walk_py_files would skip `rel_path` ("/"-separated, relative to the tests root):
+    the file itself or any directory above it matches an exclude glob."""
+    if not exclude:
+        return False
+    parts = rel_path.split("/")
+    return any(_excluded(parts[i], "/".join(parts[:i + 1]), exclude) for i in range(len(parts)))
+
+
+def walk_py_files(tests_root: Path, exclude: Sequence[str] = (),
+                  max_workers: Optional[int] = None) -> Iterator[FileEntry]:
+    """Yield .py files under tests_root while the walk is still running.
+
+    Directories are scanned with os.scandir on a thread pool, every sub-directory becoming its
+    own task, so large or network-mounted trees are enumerated in parallel. Symlinked
+    directories are not followed (same as Path.rglob). Order is not deterministic.
+    """
+    out: "queue.SimpleQueue[Optional[List[FileEntry]]]" = queue.SimpleQueue()
+    lock = threading.Lock()
+    pending = [1]
+    pool = ThreadPoolExecutor(max_workers=max_workers or min(32, (os.cpu_count() or 1) * 4))
+
+    def scan(directory: str, rel: str) -> None:
+        files: List[FileEntry] = []
+        subdirs = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    name = entry.name
+                    entry_rel = f"{rel}/{name}" if rel else name
+                    if exclude and _excluded(name, entry_rel, exclude):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append((entry.path, entry_rel))
+                        elif name.endswith(".py") and not name.startswith(".") and entry.is_file():
+                            st = entry.stat()
+                            files.append((entry.path, st.st_mtime_ns, st.st_size))
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        finally:
+            if files:
+                out.put(files)
+            with lock:
+                pending[0] += len(subdirs) - 1
+                finished = pending[0] == 0
+            for sub in subdirs:
+                pool.submit(scan, *sub)
+            if finished:
+                out.put(None)
+
+    pool.submit(scan, str(tests_root), "")
+    try:
+        while True:
+            batch = out.get()
+            if batch is None:
+                break
+            yield from batch
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_py_files(tests_root: Path, exclude: Sequence[str] = ()) -> Iterable[Path]:
+    for path, _, _ in walk_py_files(tests_root, exclude):
+        yield Path(path)
+
+def tree_signature(tests_root: Path, exclude: Sequence[str] = ()) -> str:
+    """Digest of every test file's (path, mtime, size); changes when a file is added, removed or edited."""
+    h = hashlib.blake2b(digest_size=16)
+    for entry in sorted(walk_py_files(tests_root, exclude)):
+        h.update(repr(entry).encode("utf-8"))
+    return h.hexdigest()
 
 def read_text(path: Path) -> str:
     try:
@@ -18,11 +102,20 @@ def read_text(path: Path) -> str:
     except UnicodeDecodeError:
         return path.read_text(encoding="utf-8", errors="ignore")
 
+def decode_source(data: bytes) -> str:
+    """Same fallback as read_text, for callers that already hold the raw bytes."""
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("utf-8", errors="ignore")
+
 def _read_one(path: Path) -> tuple[str, str]:
     return (str(path), read_text(path))
 
-def collect_sources(tests_root: Path) -> List[tuple[str, str]]:
-    files = list(iter_py_files(tests_root))
+def collect_sources(tests_root: Path, files: Optional[List[Path]] = None) -> List[tuple[str, str]]:
+    """Read every .py under tests_root, or only `files` when given (incremental runs)."""
+    if files is None:
+        files = sorted(iter_py_files(tests_root))
     items: List[tuple[str, str]] = []
     with ThreadPoolExecutor() as pool:
         for result in tqdm(pool.map(_read_one, files), total=len(files), desc=f"Scanning {tests_root}"):
@@ -1,82 +1,171 @@
 """
 Author: Shawny
 """
+import numpy as np
 import pandas as pd
-from typing import Dict, List
+from typing import Dict, Iterable, List
 
-from .device_map import devices_from_markers
+from .device_map import csv_masks, get_matcher
 from .parser import TestCaseMeta
-from .path_dim import dir_group, owner_top, owner_subdir
-from .quality import score_test_case
+from .path_dim import path_dims
+from .quality import SKIP_MARKS, score_arrays
+
+CASE_COLUMNS = [
+    "file", "dir_group", "owner_top", "owner_subdir", "test", "level", "devices", "markers",
+    "pytest_decorators", "is_skip", "assert_count", "has_docstring", "has_parametrize",
+    "quality_score", "quality_grade",
+]
+
+# Low-cardinality columns stored as categoricals (categories sorted, so ordering is unchanged)
+CATEGORY_COLUMNS = ["dir_group", "owner_top", "owner_subdir", "level", "devices", "quality_grade"]
+
+# Non-string columns; with CATEGORY_COLUMNS these give an empty table the same dtypes as a populated one
+NUMERIC_DTYPES = {
+    "is_skip": bool, "assert_count": np.int64, "has_docstring": bool, "has_parametrize": bool,
+    "quality_score": np.int64,
+}
+
+
+def _categorize(df: pd.DataFrame) -> pd.DataFrame:
+    for col in CATEGORY_COLUMNS:
+        df[col] = pd.Categorical(df[col])
+    return df
+
+
+def _plain(df: pd.DataFrame) -> pd.DataFrame:
+    """Summaries are tiny; keep their key columns as plain strings for pivoting / export."""
+    cats = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    return df.astype({c: object for c in cats}) if cats else df
+
+
+def build_case_table(cases: List[TestCaseMeta],
+                     device_keywords: Dict[str, list[str]],
+                     tests_root: str,
+                     dir_group_depth: int = 2) -> pd.DataFrame:
+    """One row per test case; every summary is derived from this table.
+
+    Built column by column: path grouping runs once per distinct file, device mapping and
+    marker flags once per distinct marker set, and quality scoring as array arithmetic.
+    """
+    if not cases:
+        return _categorize(pd.DataFrame({c: pd.Series(dtype=NUMERIC_DTYPES.get(c, str)) for c in CASE_COLUMNS}))
+
+    files = [c.file_path for c in cases]
+    dims_of = path_dims(tests_root, dir_group_depth)
+    dims = {f: dims_of(f) for f in dict.fromkeys(files)}
+
+    # marker set -> (devices csv, markers csv, is_skip, has skip/skipif/xfail)
+    matcher = get_matcher(device_keywords)
+    marker_info = {}
+    for ms in {c.markers for c in cases}:
+        devs = sorted(matcher.names(matcher.mask(ms)))
+        lower = {m.lower() for m in ms}
+        marker_info[ms] = (",".join(devs) if devs else "unknown", ",".join(sorted(ms)),
+                           "skip" in lower, bool(lower & SKIP_MARKS))
+    dec_csv = {decs: ",".join([d for d in decs if d]) for decs in {c.pytest_decorators for c in cases}}
+
+    info = [marker_info[c.markers] for c in cases]
+    file_dims = [dims[f] for f in files]
+    assert_count = np.fromiter((c.assert_count for c in cases), dtype=np.int64, count=len(cases))
+    has_docstring = np.fromiter((c.has_docstring for c in cases), dtype=bool, count=len(cases))
+    has_parametrize = np.fromiter((c.has_parametrize for c in cases), dtype=bool, count=len(cases))
+    has_skip_mark = np.fromiter((i[3] for i in info), dtype=bool, count=len(cases))
+    score, grade = score_arrays(assert_count, has_parametrize, has_docstring, has_skip_mark)
+
+    df = pd.DataFrame({
+        "file": files,
+        "dir_group": [d[0] for d in file_dims],
+        "owner_top": [d[1] for d in file_dims],
+        "owner_subdir": [d[2] for d in file_dims],
+        "test": [c.node_name for c in cases],
+        "level": [c.level or "unmarked" for c in cases],
+        "devices": [i[0] for i in info],
+        "markers": [i[1] for i in info],
+        "pytest_decorators": [dec_csv[c.pytest_decorators] for c in cases],
+        "is_skip": np.fromiter((i[2] for i in info), dtype=bool, count=len(cases)),
+        "assert_count": assert_count,
+        "has_docstring": has_docstring,
+        "has_parametrize": has_parametrize,
+        "quality_score": score,
+        "quality_grade": grade,
+    }, columns=CASE_COLUMNS)
+    return _categorize(df)
+
+
+def patch_case_table(df_prev: pd.DataFrame,
+                     drop_files: Iterable[str],
+                     cases: List[TestCaseMeta],
+                     device_keywords: Dict[str, list[str]],
+                     tests_root: str,
+                     dir_group_depth: int = 2) -> pd.DataFrame:
+    """Replace the rows of `drop_files` in a previous case table with freshly parsed `cases`."""
+    drop = set(drop_files)
+    kept = df_prev[~df_prev["file"].isin(drop)]
+    # Excel round-trips empty strings as NaN
+    kept = kept.fillna({"markers": "", "pytest_decorators": ""})
+    fresh = build_case_table(cases, device_keywords, tests_root, dir_group_depth)
+    if fresh.empty:
+        return kept.reset_index(drop=True)
+    # categories differ between the two parts, so re-derive them after concatenating
+    merged = pd.concat([kept.astype({c: object for c in CATEGORY_COLUMNS}),
+                        fresh.astype({c: object for c in CATEGORY_COLUMNS})], ignore_index=True)
+    return _categorize(merged)
+
 
 def build_dataframes(cases: List[TestCaseMeta],
                      device_keywords: Dict[str, list[str]],
-                     tests_root: str):
-
-    rows = []
-    for c in cases:
-        devs = sorted(devices_from_markers(c.markers, device_keywords))
-        q = score_test_case(
-            assert_count=c.assert_count,
-            has_parametrize=c.has_parametrize,
-            has_docstring=c.has_docstring,
-            markers=c.markers,
-        )
-        markers_csv = ",".join(sorted(c.markers))
-        pytest_decs_csv = ",".join([d for d in c.pytest_decorators if d])
-        is_skip = ("skip" in {m.lower() for m in c.markers})
-        rows.append({
-            "file": c.file_path,
-            "dir_group": dir_group(c.file_path, tests_root),
-            "owner_top": owner_top(c.file_path, tests_root),
-            "owner_subdir": owner_subdir(c.file_path, tests_root),
-            "test": c.node_name,
-            "level": c.level or "unmarked",
-            "devices": ",".join(devs) if devs else "unknown",
-            "markers": markers_csv,
-            "pytest_decorators": pytest_decs_csv,
-            "is_skip": bool(is_skip),
-            "assert_count": int(c.assert_count),
-            "has_docstring": bool(c.has_docstring),
-            "has_parametrize": bool(c.has_parametrize),
-            "quality_score": int(q.score),
-            "quality_grade": q.grade,
-        })
-
-    df_cases_all = pd.DataFrame(rows)
+                     tests_root: str,
+                     dir_group_depth: int = 2):
+    return build_summaries(build_case_table(cases, device_keywords, tests_root, dir_group_depth))
 
+
+def _level_device_counts(df: pd.DataFrame) -> pd.DataFrame:
+    """Cases per (level, device), counting a case once for each device it runs on.
+
+    Works on device bitmasks of the distinct `devices` values instead of splitting and exploding
+    the comma-separated column row by row.
+    """
+    devices = df["devices"].astype("category")
+    cats = [str(c) for c in devices.cat.categories]
+    names = sorted({d for c in cats for d in c.split(",")})
+    masks = csv_masks(cats, names)[devices.cat.codes.to_numpy()]
+
+    flags = pd.DataFrame({d: (masks & (1 << i)) != 0 for i, d in enumerate(names)})
+    flags["level"] = df["level"].astype(object).to_numpy()
+    counts = flags.groupby("level").sum().stack()
+    counts = counts[counts > 0]
+    out = counts.rename_axis(["level", "device"]).reset_index(name="cases")
+    out["cases"] = out["cases"].astype(np.int64)
+    return out.sort_values(["level", "device"]).reset_index(drop=True)
+
+
+def build_summaries(df_cases_all: pd.DataFrame):
+    """Derive all summary tables from the case table."""
     # Main statistics exclude ONLY @pytest.mark.skip
     df_cases_main = df_cases_all[~df_cases_all["is_skip"]].copy()
 
     # ---- MAIN summaries (skip removed) ----
-    df_level = (df_cases_main.groupby("level", as_index=False)
+    df_level = (df_cases_main.groupby("level", as_index=False, observed=True)
                 .agg(total_cases=("test", "count"))
                 .sort_values("level"))
 
-    df_exploded = df_cases_main.copy()
-    df_exploded["device"] = df_exploded["devices"].str.split(",")
-    df_exploded = df_exploded.explode("device")
-    df_exploded["device"] = df_exploded["device"].fillna("unknown")
-
-    df_level_device = (df_exploded.groupby(["level", "device"], as_index=False)
-                       .agg(cases=("test", "count"))
-                       .sort_values(["level", "device"]))
+    df_level_device = _level_device_counts(df_cases_main)
 
-    df_dir_top = (df_cases_main.groupby("dir_group", as_index=False)
+    df_dir_top = (df_cases_main.groupby("dir_group", as_index=False, observed=True)
                   .agg(total=("test", "count"))
                   .sort_values("total", ascending=False))
 
     # ---- QUALITY summaries (NO skipping) ----
-    df_quality = (df_cases_all.groupby("quality_grade", as_index=False)
+    df_quality = (df_cases_all.groupby("quality_grade", as_index=False, observed=True)
                   .agg(cases=("test", "count"))
                   .sort_values("quality_grade"))
 
-    df_quality_level = (df_cases_all.groupby(["level", "quality_grade"], as_index=False)
+    df_quality_level = (df_cases_all.groupby(["level", "quality_grade"], as_index=False, observed=True)
                         .agg(cases=("test", "count"))
                         .sort_values(["level", "quality_grade"]))
 
     # More fine-grained owner for table: owner_subdir
-    df_quality_owner = (df_cases_all.groupby(["owner_top", "owner_subdir", "quality_grade"], as_index=False)
+    df_quality_owner = (df_cases_all.groupby(["owner_top", "owner_subdir", "quality_grade"], as_index=False, observed=True)
                         .agg(cases=("test", "count"))
                         .sort_values(["owner_top", "owner_subdir", "quality_grade"]))
 
@@ -87,7 +176,7 @@ def build_dataframes(cases: List[TestCaseMeta],
     df_dec["pytest_decorator"] = df_dec["pytest_decorator"].fillna("").str.strip()
     df_dec = df_dec[df_dec["pytest_decorator"] != ""]
 
-    df_pytest_decorators = (df_dec.groupby("pytest_decorator", as_index=False)
+    df_pytest_decorators = (df_dec.groupby("pytest_decorator", as_index=False, observed=True)
                             .agg(
                                 occurrences=("pytest_decorator", "count"),
                                 unique_test_cases=("test", "nunique"),
@@ -96,11 +185,11 @@ def build_dataframes(cases: List[TestCaseMeta],
 
     return {
         "df_cases_all": df_cases_all,
-        "df_level": df_level,
-        "df_level_device": df_level_device,
-        "df_dir_top": df_dir_top,
-        "df_quality": df_quality,
-        "df_quality_level": df_quality_level,
-        "df_quality_owner": df_quality_owner,
+        "df_level": _plain(df_level),
+        "df_level_device": _plain(df_level_device),
+        "df_dir_top": _plain(df_dir_top),
+        "df_quality": _plain(df_quality),
+        "df_quality_level": _plain(df_quality_level),
+        "df_quality_owner": _plain(df_quality_owner),
         "df_pytest_decorators": df_pytest_decorators,
     }
@@ -0,0 +1,92 @@
+"""
+Author: Shawny
+Columnar (Feather/Arrow) store of the case table and all summary tables.
+
+This is the data service's source of truth; Excel is only an export format.
+Layout::
+
+    <store_dir>/CURRENT            name of the live version (replaced atomically)
+    <store_dir>/<version>/<table>.feather
+    <store_dir>/<version>/meta.json   run metadata, e.g. the tests root the file paths live under
+"""
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+from .excel import SHEETS
+
+CURRENT_FILE = "CURRENT"
+META_FILE = "meta.json"
+KEEP_VERSIONS = 2
+
+
+def _require_pyarrow() -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("The columnar store needs pyarrow: pip install pyarrow") from e
+
+
+def is_store(path: str) -> bool:
+    return (Path(path) / CURRENT_FILE).is_file()
+
+
+def current_version(store_dir: str) -> Optional[str]:
+    try:
+        return (Path(store_dir) / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+
+def write_store(store_dir: str, meta: Optional[Dict[str, Any]] = None, **dfs) -> str:
+    """Write a new version of every table (plus `meta`, if given) and switch CURRENT to it; returns the version."""
+    _require_pyarrow()
+    root = Path(store_dir)
+    version = f"v{time.time_ns()}"
+    vdir = root / version
+    vdir.mkdir(parents=True, exist_ok=False)
+    for key, table in SHEETS:
+        dfs[key].reset_index(drop=True).to_feather(vdir / f"{table}.feather")
+    if meta:
+        (vdir / META_FILE).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    tmp = root / (CURRENT_FILE + ".tmp")
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, root / CURRENT_FILE)
+    _prune(root, version)
+    return version
+
+
+def _prune(root: Path, current: str) -> None:
+    """Keep the newest few versions so readers mid-load of the previous one are not broken."""
+    versions = sorted((p for p in root.iterdir() if p.is_dir() and p.name.startswith("v")),
+                      key=lambda p: int(p.name[1:]) if p.name[1:].isdigit() else 0)
+    for p in versions[:-KEEP_VERSIONS]:
+        if p.name != current:
+            shutil.rmtree(p, ignore_errors=True)
+
+
+def read_store(store_dir: str) -> Tuple[str, Dict[str, pd.DataFrame]]:
+    """Return (version, {table name: DataFrame}) for the live version."""
+    _require_pyarrow()
+    version = current_version(store_dir)
+    if version is None:
+        raise FileNotFoundError(f"No columnar store at {store_dir}")
+    vdir = Path(store_dir) / version
+    return version, {table: pd.read_feather(vdir / f"{table}.feather") for _, table in SHEETS}
+
+
+def read_store_meta(store_dir: str, version: Optional[str] = None) -> Dict[str, Any]:
+    """Run metadata of `version` (default: the live one); empty for stores written without it."""
+    version = version or current_version(store_dir)
+    if version is None:
+        return {}
+    try:
+        return json.loads((Path(store_dir) / version / META_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
@@ -1,10 +1,16 @@
 """
 Author: Shawny
 """
+import hashlib
+import threading
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Optional
 from flask import Flask, jsonify, render_template, request
 
 from ms_test_stats.data_service import (
+    data_last_modified,
+    data_version,
     fetch_level_device,
     fetch_dir_top,
     fetch_quality,
@@ -12,12 +18,49 @@ from ms_test_stats.data_service import (
     fetch_pytest_decorators,
     fetch_cases_by_level_device,
     fetch_cases_by_level_grade,
+    fetch_diff,
 )
+from ms_test_stats.history import fetch_series, list_runs, list_series, parse_time
+from ms_test_stats.live import LiveRescanner
+from ms_test_stats.profiling import RequestMetrics
 
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 5000
+DEFAULT_HISTORY_POINTS = 365
+# query args of /api/history/series that are not dimension filters
+_SERIES_ARGS = {"table", "metric", "branch", "since", "until", "points", "agg"}
 
-def create_app(excel_path: str) -> Flask:
+
+def create_app(data_path: str, history_db: Optional[str] = None, diff_baseline: Optional[str] = None,
+               live: Optional[LiveRescanner] = None) -> Flask:
     app = Flask(__name__, template_folder=str(Path(__file__).resolve().parent.parent / "templates"))
-    excel = str(Path(excel_path))
+    data = str(Path(data_path))
+    metrics = RequestMetrics()
+    metrics.install(app)
+
+    # Summary payloads only change with the data version: serialize once per version,
+    # then serve the same bytes with an ETag / Last-Modified so browsers can revalidate (304).
+    payloads = {}
+    payloads_lock = threading.Lock()
+
+    def cached_json(key, fetch):
+        version = data_version(data)
+        entry = payloads.get(key)
+        if entry is None or entry[0] != version:
+            with payloads_lock:
+                entry = payloads.get(key)
+                if entry is None or entry[0] != version:
+                    body = app.json.dumps(fetch(data)).encode("utf-8")
+                    etag = hashlib.sha1(body).hexdigest()
+                    modified = datetime.fromtimestamp(data_last_modified(data), tz=timezone.utc)
+                    entry = (version, body, etag, modified)
+                    payloads[key] = entry
+        _, body, etag, modified = entry
+        resp = app.response_class(body, mimetype="application/json")
+        resp.set_etag(etag)
+        resp.last_modified = modified
+        resp.cache_control.no_cache = True
+        return resp.make_conditional(request)
 
     @app.get("/")
     def index():
@@ -25,35 +68,133 @@ def create_app(excel_path: str) -> Flask:
 
     @app.get("/api/level_device")
     def api_level_device():
-        return jsonify(fetch_level_device(excel))
+        return cached_json("level_device", fetch_level_device)
 
     @app.get("/api/dir_top")
     def api_dir_top():
-        return jsonify(fetch_dir_top(excel))
+        return cached_json("dir_top", fetch_dir_top)
 
     @app.get("/api/quality")
     def api_quality():
-        return jsonify(fetch_quality(excel))
+        return cached_json("quality", fetch_quality)
 
     @app.get("/api/quality_owner_table")
     def api_quality_owner_table():
-        return jsonify(fetch_quality_owner_table(excel))
+        return cached_json("quality_owner_table", fetch_quality_owner_table)
 
     @app.get("/api/pytest_decorators_table")
     def api_pytest_decorators_table():
-        return jsonify(fetch_pytest_decorators(excel))
+        return cached_json("pytest_decorators", fetch_pytest_decorators)
+
+    def page_args():
+        """Pagination / projection / sorting query args shared by the drill-down endpoints."""
+        args = request.args
+        limit = min(int(args.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        fields = [f for f in args.get("fields", "").split(",") if f] or None
+        return {
+            "offset": int(args.get("offset", 0)),
+            "limit": limit,
+            "fields": fields,
+            "sort": args.get("sort") or None,
+            "descending": args.get("order", "asc").lower() == "desc",
+        }
+
+    def bad_request(e: Exception):
+        return jsonify({"error": str(e)}), 400
 
     @app.get("/api/cases")
     def api_cases():
         level = request.args.get("level", "")
         device = request.args.get("device", "")
-        return jsonify(fetch_cases_by_level_device(excel, level, device))
+        try:
+            return jsonify(fetch_cases_by_level_device(data, level, device, **page_args()))
+        except ValueError as e:
+            return bad_request(e)
 
     @app.get("/api/cases_quality")
     def api_cases_quality():
         level = request.args.get("level", "")
         grade = request.args.get("grade", "")
-        return jsonify(fetch_cases_by_level_grade(excel, level, grade))
+        try:
+            return jsonify(fetch_cases_by_level_grade(data, level, grade, **page_args()))
+        except ValueError as e:
+            return bad_request(e)
+
+    @app.get("/api/diff")
+    def api_diff():
+        if not diff_baseline or not Path(diff_baseline).exists():
+            return jsonify({"error": "no baseline run configured (diff_baseline)"}), 404
+        kinds = [k for k in request.args.get("change", "").split(",") if k] or None
+        try:
+            return jsonify({"baseline": diff_baseline, **fetch_diff(data, diff_baseline, kinds, **page_args())})
+        except ValueError as e:
+            return bad_request(e)
+
+    def history_args():
+        args = request.args
+        return {
+            "branch": args.get("branch") or None,
+            "since": parse_time(args.get("since")),
+            "until": parse_time(args.get("until")),
+        }
+
+    def no_history():
+        if history_db and Path(history_db).is_file():
+            return None
+        return jsonify({"error": "no run history recorded (history_db)"}), 404
+
+    @app.get("/api/history/runs")
+    def api_history_runs():
+        missing = no_history()
+        if missing:
+            return missing
+        try:
+            return jsonify(list_runs(history_db, **history_args()))
+        except ValueError as e:
+            return bad_request(e)
+
+    @app.get("/api/history/series_keys")
+    def api_history_series_keys():
+        missing = no_history()
+        if missing:
+            return missing
+        return jsonify(list_series(history_db, request.args.get("table") or None))
+
+    @app.get("/api/history/series")
+    def api_history_series():
+        missing = no_history()
+        if missing:
+            return missing
+        args = request.args
+        if not args.get("table") or not args.get("metric"):
+            return bad_request(ValueError("table and metric are required"))
+        dims = {k: v for k, v in args.items() if k not in _SERIES_ARGS}
+        try:
+            points = int(args.get("points", DEFAULT_HISTORY_POINTS))
+            return jsonify(fetch_series(history_db, args["table"], args["metric"], dims,
+                                        points=points, agg=args.get("agg", "last"), **history_args()))
+        except ValueError as e:
+            return bad_request(e)
+
+    @app.get("/api/live")
+    def api_live():
+        if live is None:
+            return jsonify({"error": "not running in live mode (run.py --live)"}), 404
+        return jsonify(live.status())
+
+    @app.post("/api/live/rescan")
+    def api_live_rescan():
+        if live is None:
+            return jsonify({"error": "not running in live mode (run.py --live)"}), 404
+        live.trigger()
+        return jsonify({"triggered": True, **live.status()}), 202
+
+    @app.get("/metrics")
+    def api_metrics():
+        # Prometheus text by default; ?format=json for p50/p95/p99 per endpoint
+        if request.args.get("format") == "json":
+            return jsonify(metrics.snapshot())
+        return app.response_class(metrics.prometheus(), mimetype="text/plain; version=0.0.4")
 
     @app.get("/shutdown")
     def shutdown():
@@ -1,54 +1,263 @@
 """
 Author: Shawny
 """
-import re
+import argparse
+import os
 import yaml
-from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Optional
 
-from ms_test_stats.scanner import collect_sources
-from ms_test_stats.parser import extract_testcases_from_file
-from ms_test_stats.stats import build_dataframes
-from ms_test_stats.excel import write_excel
+from ms_test_stats.artifact import load_cases, save_cases
+from ms_test_stats.cache import ContentIndex
+from ms_test_stats.pipeline import (
+    build_stats,
+    data_path_of,
+    level_pattern_of,
+    open_parse_cache,
+    open_pool,
+    ordered_cases,
+    parse_files,
+    record_history,
+    run_pipeline,
+    scanned_commit,
+    tests_root_of,
+    worker_count,
+    write_data,
+    write_outputs,
+    write_run_report,
+)
+from ms_test_stats.scanner import tree_signature, walk_py_files
+from ms_test_stats.stats import build_summaries, patch_case_table
+from ms_test_stats.gitdiff import changed_py_files, head_info, rev_parse
+from ms_test_stats.data_service import load_case_table, refresh, run_meta
+from ms_test_stats.live import LiveRescanner
+from ms_test_stats.profiling import RunProfile, capture
 from ms_test_stats.webapp import create_app
 from ms_test_stats.report import write_report
 
 
-def _parse_worker(args):
-    """Worker function for parallel AST parsing."""
-    py_path, src, level_pattern = args
+def _run_batch(cfg, level_pattern: str, cache, profile: RunProfile) -> None:
+    """Scan every entry of `batch` (repo roots or git worktrees) on one worker pool.
+
+    Files identical to the same path in an earlier branch of this batch (or to their cached content)
+    are not parsed again. Each branch gets its own output directory.
+    """
+    branches = cfg.get("batch") or []
+    if not branches:
+        raise SystemExit("[ERROR] --batch needs a non-empty `batch` list in config.yaml")
+    out_root = Path(cfg.get("batch_output_dir", "output/batch"))
+    use_store = bool(cfg.get("output_store", "output/stats_store"))
+    exclude = cfg.get("scan_exclude") or []
+    content = ContentIndex(cache.content_index() if cache is not None else None)
+    seen, roots = set(), []
+
+    with open_pool(cfg) as pool:
+        for branch in branches:
+            name = branch["name"]
+            repo_root = Path(branch["repo_root"]).resolve()
+            tests_root = repo_root / branch.get("tests_dir", cfg.get("tests_dir", "tests"))
+            print(f"[OK] Batch {name}: {tests_root}")
+
+            branch_profile = RunProfile(name)
+            by_file = parse_files(walk_py_files(tests_root, exclude), level_pattern, cache, branch_profile,
+                                  pool, content, tests_root, memory_cap_mb=cfg.get("memory_cap_mb"))
+            seen.update(by_file)
+            roots.append(tests_root)
+            out_dir = out_root / name
+            commit = head_info(repo_root)[0]
+            save_cases(str(out_dir / "cases.pkl"), by_file, str(tests_root), level_pattern, commit)
+            dfs = build_stats(ordered_cases(by_file), cfg, tests_root, branch_profile)
+
+            write_outputs(cfg, dfs, str(out_dir / "stats.xlsx"), str(out_dir / "stats_store") if use_store else None,
+                          str(out_dir / "report.html"), branch_profile, tests_root, commit)
+            record_history(cfg, dfs, repo_root, branch_profile, branch=name)
+            profile.extra.setdefault("branch_parse", {})[name] = branch_profile.parse.report()
+            profile.stages += [dict(s, stage=f"{name}/{s['stage']}") for s in branch_profile.stages]
+
+    if cache is not None:
+        cache.prune(seen, roots)
+        cache.save()
+    print(f"[OK] Batch done: {len(branches)} branches, {len(content)} distinct file contents")
+
+
+def _patch_cases_artifact(cfg, tests_root: Path, level_pattern: str, base: str, drop, by_file, commit: str) -> None:
+    """Bring the scan stage's cases artifact from `base` to `commit`, so later CLI stages see the patched tree.
+
+    Only an artifact of the same snapshot as the patched case table (scanned at `base`) is patched; any
+    other one is left as it is rather than patched with a diff that does not start at its own commit.
+    """
+    path = cfg.get("cases_artifact", "output/cases.pkl")
+    if not path:
+        return
+    try:
+        meta, all_files = load_cases(path, level_pattern)
+    except (OSError, ValueError):
+        return  # no usable artifact: the next full scan writes one
+    if meta["tests_root"] != str(tests_root):
+        return
+    if meta.get("commit") != base:
+        print(f"[INFO] {path} was scanned at {(meta.get('commit') or 'an unknown commit')[:10]}, not {base[:10]}; "
+              f"left as it is")
+        return
+    for p in drop:
+        all_files.pop(p, None)
+    all_files.update(by_file)
+    save_cases(path, all_files, str(tests_root), level_pattern, commit)
+
+
+def _since_base(repo_root: Path, tests_root: Path, since: str, prev_data: str) -> Optional[str]:
+    """Commit to diff from in --since mode: the one the previous case table (`prev_data`) was scanned at.
+
+    The diff always starts there, so the patched table matches a full rescan of HEAD; `since`, when
+    given, is only checked against it. None (the caller does a full scan) when the table records no
+    commit for this tests root, or either commit is unknown to the repository.
+    """
+    meta = run_meta(prev_data)
+    scanned_at = meta.get("commit") if meta.get("tests_root") == str(tests_root) else None
+    if scanned_at is None:
+        print(f"[WARN] {prev_data} records no scanned commit for {tests_root}; falling back to a full scan")
+        return None
     try:
-        return extract_testcases_from_file(py_path, src, re.compile(level_pattern))
-    except SyntaxError:
-        return []
+        base = rev_parse(repo_root, scanned_at)
+        wanted = rev_parse(repo_root, since) if since else base
+    except RuntimeError as e:
+        print(f"[WARN] {e}; falling back to a full scan")
+        return None
+    if wanted != base:
+        print(f"[WARN] --since {since} ignored: the previous run was scanned at {base[:10]}, patching from there")
+    return base
+
+
+def _git_patch(cfg, repo_root: Path, tests_root: Path, base: str, head: str, level_pattern: str, cache, df_prev,
+               profile: RunProfile):
+    """Re-parse only files changed between commits `base` and `head` and patch the previous case table."""
+    changed, deleted = changed_py_files(repo_root, cfg.get("tests_dir", "tests"), base, head,
+                                        cfg.get("scan_exclude") or [])
+    print(f"[OK] git diff {base[:10]}..{head[:10]}: {len(changed)} changed, {len(deleted)} deleted test files")
+
+    entries = []
+    for p in changed:
+        st = p.stat()
+        entries.append((str(p), st.st_mtime_ns, st.st_size))
+    by_file = parse_files(entries, level_pattern, cache, profile, workers=worker_count(cfg),
+                          memory_cap_mb=cfg.get("memory_cap_mb"))
+
+    if cache is not None:
+        for p in deleted:
+            cache.entries.pop(str(p), None)
+        cache.save()
+
+    cases = []
+    for p in changed:
+        cases.extend(by_file[str(p)])
+    drop = [str(p) for p in changed + deleted]
+    _patch_cases_artifact(cfg, tests_root, level_pattern, base, drop, by_file, head)
+    with profile.stage("patch_case_table", cases=len(cases)):
+        return patch_case_table(df_prev, drop, cases, cfg["device_keywords"], str(tests_root),
+                                cfg.get("dir_group_depth", 2))
+
+
+def _start_live(cfg, repo_root: Path, tests_root: Path, cache, pool,
+                data_path: str, out_excel: str, out_store: Optional[str]) -> LiveRescanner:
+    """Pin the served data in memory and rebuild it in the background (schedule / file changes)."""
+    live_cfg = cfg.get("live") or {}
+    exclude = cfg.get("scan_exclude") or []
+    key = str(Path(data_path))  # the path create_app serves
+
+    def rebuild():
+        profile = RunProfile("live_rebuild")
+        commit = scanned_commit(cfg)
+        dfs = run_pipeline(cfg, profile, cache, pool, commit)
+        data_path = write_data(cfg, dfs, out_excel, out_store, profile, commit=commit)
+        with profile.stage("refresh", rows=len(dfs["df_cases_all"])):
+            version = refresh(str(Path(data_path)))
+        with profile.stage("write_report"):
+            write_report(key, "output/report.html")
+        record_history(cfg, dfs, repo_root, profile)
+        write_run_report(cfg, profile)
+        return version
+
+    signature = (lambda: tree_signature(tests_root, exclude)) if live_cfg.get("watch", True) else None
+    live = LiveRescanner(rebuild, signature,
+                         rescan_interval=live_cfg.get("rescan_interval", 86400),
+                         poll_interval=live_cfg.get("poll_interval", 60))
+    live.start(refresh(key))
+    triggers = ([f"every {live.rescan_interval}s"] if live.rescan_interval else []) + \
+               (["on test file changes"] if signature else [])
+    print(f"[OK] Live mode: rebuilding {' and '.join(triggers) or 'on POST /api/live/rescan only'} "
+          f"(checked every {live.poll_interval}s)")
+    return live
 
 
 def main():
+    ap = argparse.ArgumentParser(description="Scan MindSpore tests/ and build stats.")
+    ap.add_argument("--since", metavar="COMMIT", nargs="?", const="",
+                    help="incremental mode: re-parse only test files changed since the previous run (which "
+                         "records the commit it scanned; COMMIT, if given, must match it) and patch its case table")
+    ap.add_argument("--batch", action="store_true",
+                    help="scan every repo root / worktree listed under `batch` in config.yaml on one shared "
+                         "worker pool and write per-branch outputs (no web server)")
+    ap.add_argument("--live", action="store_true",
+                    help="long-running server: rescan repo_root in the background (see `live` in config.yaml) "
+                         "and swap new data in without interrupting requests")
+    ap.add_argument("--profile", nargs="?", const="cprofile", choices=["cprofile", "pyinstrument"],
+                    help="also profile the scan/build in this process (default cprofile) and write "
+                         "output/profile.pstats or output/profile.html")
+    args = ap.parse_args()
+    if args.batch and (args.since is not None or args.live):
+        ap.error("--batch cannot be combined with --since or --live")
+
     cfg = yaml.safe_load(Path("config.yaml").read_text(encoding="utf-8"))
 
     repo_root = Path(cfg["repo_root"]).resolve()
-    tests_root = repo_root / cfg.get("tests_dir", "tests")
+    tests_root = tests_root_of(cfg)
     out_excel = cfg.get("output_excel", "output/stats.xlsx")
+    out_store = cfg.get("output_store", "output/stats_store")
 
-    level_pattern = cfg.get("level_regex", r"^level\\d+$")
-    level_re = re.compile(level_pattern)
+    level_pattern = level_pattern_of(cfg)
+    cache = open_parse_cache(cfg)
 
-    sources = collect_sources(tests_root)
+    profile = RunProfile("batch" if args.batch else "run")
+    profile_dir = str(Path(cfg.get("run_report") or "output/run_report.json").parent)
+    if args.batch:
+        with capture(args.profile, profile_dir):
+            _run_batch(cfg, level_pattern, cache, profile)
+        write_run_report(cfg, profile)
+        return
 
-    cases = []
-    work_items = [(py_path, src, level_pattern) for py_path, src in sources]
-    with ProcessPoolExecutor() as pool:
-        for result in pool.map(_parse_worker, work_items):
-            cases.extend(result)
+    pool = None
+    if args.live:
+        pool = open_pool(cfg)
+        pool.submit(os.getpid).result()  # start the long-lived workers now, before any server thread
 
-    dfs = build_dataframes(cases, cfg["device_keywords"], str(tests_root))
-    write_excel(out_excel, **dfs)
+    with capture(args.profile, profile_dir):
+        prev_data = data_path_of(cfg)
+        head = scanned_commit(cfg)
+        base = None
+        if args.since is not None:
+            if Path(prev_data).exists():
+                base = _since_base(repo_root, tests_root, args.since, prev_data)
+            else:
+                print(f"[WARN] No previous run at {prev_data}; falling back to a full scan")
+        if base and head:
+            with profile.stage("load_previous") as st:
+                df_prev = load_case_table(prev_data)
+                st["rows"] = len(df_prev)
+            df_cases = _git_patch(cfg, repo_root, tests_root, base, head, level_pattern, cache, df_prev, profile)
+            with profile.stage("build_summaries", rows=len(df_cases)):
+                dfs = build_summaries(df_cases)
+        else:
+            dfs = run_pipeline(cfg, profile, cache, pool, head)
 
-    print(f"[OK] Excel written to: {out_excel}")
-    write_report(out_excel, "output/report.html")
-    print("[OK] Static report written to: output/report.html")
+        data_path = write_outputs(cfg, dfs, out_excel, out_store, "output/report.html", profile, commit=head)
+        record_history(cfg, dfs, repo_root, profile)
+    write_run_report(cfg, profile)
+    live = None
+    if args.live:
+        live = _start_live(cfg, repo_root, tests_root, cache, pool, data_path, out_excel, out_store)
     print("[OK] Start web on http://127.0.0.1:5000")
-    app = create_app(out_excel)
+    app = create_app(data_path, history_db=cfg.get("history_db", "output/history.sqlite"),
+                     diff_baseline=cfg.get("diff_baseline"), live=live)
     app.run(host="127.0.0.1", port=5000, debug=False)
 
 if __name__ == "__main__":